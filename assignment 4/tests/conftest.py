@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# weather.py is a script, not a package: make it importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
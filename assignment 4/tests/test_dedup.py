@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from weather import deduplicate_csv
+
+
+@pytest.fixture
+def feed(tmp_path):
+    """Raw feed where some rows repeat, including rows that differ only in formatting."""
+    rng = np.random.default_rng(4)
+    rows = pd.DataFrame({
+        'Location': rng.choice(['Oslo', 'Bergen', ''], 400),
+        'Date': pd.date_range("2024-01-01", periods=400, freq="h").strftime("%Y-%m-%d %H:%M"),
+        'Temperature': rng.normal(5, 3, 400).round(1).astype(str),
+    })
+    rows.loc[::50, 'Temperature'] = ''
+    repeats = rows.sample(300, replace=True, random_state=5)
+    feed = pd.concat([rows, repeats, rows.iloc[:20]]).sample(frac=1, random_state=6)
+    feed.iloc[0, 2] = '5.0'
+    feed.iloc[1, 2] = '5.00' # same number, different text: kept
+    path = tmp_path / "feed.csv"
+    feed.to_csv(path, index=False)
+    return path
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 64, 10_000])
+def test_matches_drop_duplicates(feed, tmp_path, chunksize):
+    out = tmp_path / "dedup.csv"
+    rows_read, rows_dropped = deduplicate_csv(feed, out, chunksize=chunksize)
+    raw = pd.read_csv(feed, dtype=str, keep_default_na=False)
+    expected = raw.drop_duplicates(ignore_index=True)
+    assert (rows_read, rows_dropped) == (len(raw), len(raw) - len(expected))
+    pd.testing.assert_frame_equal(pd.read_csv(out, dtype=str, keep_default_na=False), expected)
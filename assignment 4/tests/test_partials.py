@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from weather import finalize_partials, merge_partials, summarize_weather
+
+
+@pytest.fixture
+def weather():
+    """Hourly observations over two years with gaps, missing values and an integer column."""
+    rng = np.random.default_rng(3)
+    index = pd.date_range("2022-12-15", "2024-02-10", freq="h")
+    index = index[rng.random(len(index)) > 0.2]
+    df = pd.DataFrame({
+        'temperature': 1000 + rng.normal(15, 8, len(index)), # large offset: naive variance would lose digits
+        'rainfall': rng.exponential(1.0, len(index)) * (rng.random(len(index)) < 0.3),
+        'humidity': rng.integers(20, 100, len(index)),
+    }, index=index)
+    df.loc[df.sample(frac=0.05, random_state=1).index, 'temperature'] = np.nan
+    # A day where every temperature is missing and a day with a constant value
+    df.loc["2023-03-05", 'temperature'] = np.nan
+    df.loc["2023-03-06", 'temperature'] = 1010.1
+    return df
+
+
+def expected(df, freq, agg_map):
+    result = df.resample(freq).agg(agg_map)
+    result.columns = [f"{col}_{stat}" for col, stat in result.columns]
+    return result
+
+
+def test_summaries_match_resample(weather, tmp_path, capsys):
+    agg_map, _, _, _, daily, monthly, yearly = summarize_weather(weather, tmp_path)
+    for result, freq in [(daily, 'D'), (monthly, 'M'), (yearly, 'Y')]:
+        pd.testing.assert_frame_equal(result, expected(weather, freq, agg_map), check_exact=False, rtol=1e-9)
+
+
+def test_other_groupings_roll_up_from_daily(weather, tmp_path, capsys):
+    agg_map, partials, refs, dtypes, *_ = summarize_weather(weather, tmp_path)
+    month_of_year = finalize_partials(merge_partials(partials.groupby(partials.index.month)), agg_map, refs, dtypes)
+    result = weather.groupby(weather.index.month).agg(agg_map)
+    result.columns = [f"{col}_{stat}" for col, stat in result.columns]
+    pd.testing.assert_frame_equal(month_of_year, result, check_exact=False, rtol=1e-9)
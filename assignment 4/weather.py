@@ -1,267 +1,574 @@
-from pathlib import Path
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import warnings
-warnings.simplefilter(action='ignore', category=FutureWarning)
-
-OUTPUT_DIR = Path("./weather_analysis_output")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-CSV_FILENAME = "weather_1.csv"
-if not Path(CSV_FILENAME).exists():
-    raise FileNotFoundError(f"Expected file '{CSV_FILENAME}' in the current working directory.")
-
-# --- Load ---
-df = pd.read_csv(CSV_FILENAME)
-print("Loaded CSV. Columns:")
-for c in df.columns:
-    print(" -", c)
-
-# --- Robust column detection by substring ---
-col_candidates = {c: c.lower().strip() for c in df.columns}
-
-def detect_by_substrings(subs):
-    for col, lc in col_candidates.items():
-        for s in subs:
-            if s in lc:
-                return col
-    return None
-
-date_col = detect_by_substrings(["date", "time", "observation", "timestamp"])
-temp_col = detect_by_substrings(["temp", "temperature", "°c", "tmean"])
-min_temp_col = detect_by_substrings(["min_temp", "mintemp", "minimum", "tmin", "min temp"])
-max_temp_col = detect_by_substrings(["max_temp", "maxtemp", "maximum", "tmax", "max temp"])
-rain_col = detect_by_substrings(["rain", "precip", "precipitation"])
-humidity_col = detect_by_substrings(["humid", "humidity", "rel_humidity", "rh", "%"])
-
-print("\nDetected (best-effort):")
-print(" date_col:", date_col)
-print(" temp_col:", temp_col)
-print(" min_temp_col:", min_temp_col)
-print(" max_temp_col:", max_temp_col)
-print(" rain_col:", rain_col)
-print(" humidity_col:", humidity_col)
-
-# If nothing for date, fallback to first column
-if date_col is None:
-    date_col = list(df.columns)[0]
-    print("No obvious date column — using first column:", date_col)
-
-# --- Parse datetime robustly ---
-def try_parse_dates(series):
-    # try several strategies, return parsed series
-    s = pd.to_datetime(series, errors='coerce', infer_datetime_format=True)
-    if s.notna().sum() > 0:
-        return s
-    s = pd.to_datetime(series, errors='coerce', dayfirst=True, infer_datetime_format=True)
-    if s.notna().sum() > 0:
-        return s
-    # try common formats
-    fmts = ["%Y-%m-%d %H:%M", "%Y-%m-%d", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M", "%m/%d/%Y", "%d/%m/%Y"]
-    for f in fmts:
-        s = pd.to_datetime(series, format=f, errors='coerce')
-        if s.notna().sum() > 0:
-            return s
-    # last resort: try parsing each element individually (slower)
-    parsed = pd.Series([pd.to_datetime(str(x), errors='coerce', dayfirst=True) for x in series])
-    return parsed
-
-df[date_col] = try_parse_dates(df[date_col])
-n_valid_dates = df[date_col].notna().sum()
-print(f"\nParsed dates: {n_valid_dates}/{len(df)} valid.")
-
-# drop rows where date couldn't be parsed
-initial_len = len(df)
-df = df[df[date_col].notna()].copy()
-dropped = initial_len - len(df)
-print(f"Dropped {dropped} rows with invalid dates.")
-
-# --- Standardize numeric columns (create canonical names if possible) ---
-def to_numeric_col(name, canonical):
-    if name is None:
-        return False
-    if name in df.columns:
-        df[canonical] = pd.to_numeric(df[name], errors='coerce')
-        return True
-    return False
-
-created_temp = False
-if temp_col and temp_col in df.columns:
-    created_temp = to_numeric_col(temp_col, "temperature")
-
-# if mean not present but min+max present compute mean
-if not created_temp and min_temp_col and max_temp_col and min_temp_col in df.columns and max_temp_col in df.columns:
-    df["min_temperature"] = pd.to_numeric(df[min_temp_col], errors='coerce')
-    df["max_temperature"] = pd.to_numeric(df[max_temp_col], errors='coerce')
-    df["temperature"] = df[["min_temperature", "max_temperature"]].mean(axis=1)
-    created_temp = True
-else:
-    # individually create min/max if present
-    if min_temp_col and min_temp_col in df.columns:
-        df["min_temperature"] = pd.to_numeric(df[min_temp_col], errors='coerce')
-    if max_temp_col and max_temp_col in df.columns:
-        df["max_temperature"] = pd.to_numeric(df[max_temp_col], errors='coerce')
-
-created_rain = to_numeric_col(rain_col, "rainfall")
-created_humidity = to_numeric_col(humidity_col, "humidity")
-# fallback defaults
-if "rainfall" not in df.columns:
-    df["rainfall"] = 0.0
-if "humidity" not in df.columns:
-    df["humidity"] = np.nan
-
-# set index
-df.sort_values(by=date_col, inplace=True)
-df.set_index(date_col, inplace=True)
-
-# fill numeric missing values: ffill,bfill, mean
-for c in ["temperature", "min_temperature", "max_temperature", "rainfall", "humidity"]:
-    if c in df.columns:
-        df[c] = pd.to_numeric(df[c], errors='coerce')
-        df[c] = df[c].ffill().bfill()
-        if df[c].isna().any():
-            df[c].fillna(df[c].mean(skipna=True), inplace=True)
-
-# export cleaned
-cleaned_path = OUTPUT_DIR / "cleaned_weather_1.csv"
-df.to_csv(cleaned_path)
-print("\nCleaned data exported to:", cleaned_path)
-
-# --- Build aggregation dict dynamically only for columns that exist ---
-agg_map = {}
-if "temperature" in df.columns:
-    agg_map["temperature"] = ['mean', 'min', 'max', 'std']
-if "rainfall" in df.columns:
-    agg_map["rainfall"] = ['sum', 'mean', 'std']
-if "humidity" in df.columns:
-    agg_map["humidity"] = ['mean', 'min', 'max', 'std']
-
-if not agg_map:
-    raise ValueError("No numeric columns detected for aggregation (temperature/rainfall/humidity).")
-
-# daily / monthly / yearly
-daily = df.resample('D').agg(agg_map)
-daily.columns = ['_'.join(col).strip() for col in daily.columns.values]
-daily.to_csv(OUTPUT_DIR / "daily_summary.csv")
-print("Daily summary saved.")
-
-monthly = df.resample('M').agg(agg_map)
-monthly.columns = ['_'.join(col).strip() for col in monthly.columns.values]
-monthly.to_csv(OUTPUT_DIR / "monthly_summary.csv")
-print("Monthly summary saved.")
-
-yearly = df.resample('Y').agg(agg_map)
-yearly.columns = ['_'.join(col).strip() for col in yearly.columns.values]
-yearly.to_csv(OUTPUT_DIR / "yearly_summary.csv")
-print("Yearly summary saved.")
-
-# --- Plots (only create plots if required series exist) ---
-plt.close('all')
-# daily temperature line
-if 'temperature_mean' in daily.columns:
-    plt.figure(figsize=(10,4))
-    plt.plot(daily.index, daily['temperature_mean'])
-    plt.title("Daily Mean Temperature")
-    plt.xlabel("Date")
-    plt.ylabel("Temperature")
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "daily_mean_temperature.png")
-    plt.close()
-    print("Saved: daily_mean_temperature.png")
-
-# monthly rainfall bar
-if 'rainfall_sum' in monthly.columns:
-    plt.figure(figsize=(10,4))
-    months = monthly.index.strftime('%Y-%m')
-    plt.bar(months, monthly['rainfall_sum'])
-    plt.xticks(rotation=45, ha='right')
-    plt.title("Monthly Rainfall Totals")
-    plt.xlabel("Month")
-    plt.ylabel("Rainfall (sum)")
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "monthly_rainfall_totals.png")
-    plt.close()
-    print("Saved: monthly_rainfall_totals.png")
-
-# scatter humidity vs temp (daily)
-if 'temperature_mean' in daily.columns and 'humidity_mean' in daily.columns:
-    plt.figure(figsize=(6,6))
-    plt.scatter(daily['temperature_mean'], daily['humidity_mean'])
-    plt.title("Humidity vs Temperature (daily means)")
-    plt.xlabel("Temperature (mean)")
-    plt.ylabel("Humidity (mean)")
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "humidity_vs_temperature_scatter.png")
-    plt.close()
-    print("Saved: humidity_vs_temperature_scatter.png")
-
-# combined monthly (temp & rainfall)
-if 'temperature_mean' in monthly.columns and 'rainfall_sum' in monthly.columns:
-    fig, ax1 = plt.subplots(figsize=(10,5))
-    ax1.plot(monthly.index, monthly['temperature_mean'], label='Temp (mean)')
-    ax1.set_xlabel("Month")
-    ax1.set_ylabel("Monthly Mean Temperature")
-    ax1.set_xticks(monthly.index)
-    ax1.set_xticklabels(monthly.index.strftime('%Y-%m'), rotation=45, ha='right')
-    ax2 = ax1.twinx()
-    ax2.bar(monthly.index, monthly['rainfall_sum'], alpha=0.3, label='Rainfall (sum)')
-    ax2.set_ylabel("Monthly Rainfall (sum)")
-    plt.title("Monthly Mean Temperature and Rainfall (combined)")
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "monthly_temp_rainfall_combined.png")
-    plt.close()
-    print("Saved: monthly_temp_rainfall_combined.png")
-
-# --- Group by month and season ---
-df_month = df.copy()
-df_month['month'] = df_month.index.month
-grouped_by_month = df_month.groupby('month').agg({
-    k: (['mean','min','max','std'] if k=='temperature' else (['sum','mean'] if k=='rainfall' else ['mean','min','max']))
-    for k in ['temperature','rainfall','humidity'] if k in df_month.columns
-})
-if not grouped_by_month.empty:
-    grouped_by_month.columns = ['_'.join(col).strip() for col in grouped_by_month.columns.values]
-    grouped_by_month.to_csv(OUTPUT_DIR / "grouped_by_month.csv")
-    print("Saved: grouped_by_month.csv")
-
-def month_to_season(m):
-    if m in [12,1,2]: return 'DJF'
-    if m in [3,4,5]: return 'MAM'
-    if m in [6,7,8]: return 'JJA'
-    return 'SON'
-
-df_season = df.copy()
-df_season['season'] = df_season.index.month.map(month_to_season)
-grouped_by_season = df_season.groupby('season').agg({
-    k: (['mean','min','max','std'] if k=='temperature' else (['sum','mean'] if k=='rainfall' else ['mean','min','max']))
-    for k in ['temperature','rainfall','humidity'] if k in df_season.columns
-})
-if not grouped_by_season.empty:
-    grouped_by_season.columns = ['_'.join(col).strip() for col in grouped_by_season.columns.values]
-    grouped_by_season.to_csv(OUTPUT_DIR / "grouped_by_season.csv")
-    print("Saved: grouped_by_season.csv")
-
-# --- Report ---
-report_path = OUTPUT_DIR / "report.md"
-with open(report_path, "w", encoding="utf-8") as f:
-    f.write("# Weather Analysis Report\n\n")
-    f.write(f"Source file: `{CSV_FILENAME}`\n\n")
-    f.write(f"Rows after cleaning: {len(df)}\n\n")
-    if len(df)>0:
-        f.write(f"Date range: {df.index.min().date()} to {df.index.max().date()}\n\n")
-    f.write("Files generated:\n\n")
-    for p in sorted(OUTPUT_DIR.iterdir()):
-        f.write(f"- `{p.name}`\n")
-    f.write("\nAutomatic insights:\n\n")
-    try:
-        if 'temperature_max' in daily.columns:
-            hottest = daily['temperature_max'].idxmax().date()
-            f.write(f"- Hottest day (daily max): {hottest}\n")
-        if 'rainfall_sum' in monthly.columns:
-            wettest = monthly['rainfall_sum'].idxmax().strftime('%Y-%m')
-            f.write(f"- Wettest month: {wettest}\n")
-    except Exception:
-        f.write("- Some insights could not be computed.\n")
-print("\nReport written to", report_path)
-print("\nAll done — outputs are in:", OUTPUT_DIR.resolve())
+from pathlib import Path
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+from pandas.tseries.api import guess_datetime_format
+import matplotlib.pyplot as plt
+import warnings
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
+# Usage:
+#   python weather.py                               analyse all observations together
+#   python weather.py --per-location [--workers N]  clean and aggregate each location separately,
+#                                                   one worker process per location
+#   python weather.py --keep-duplicates             skip the de-duplication pass
+#
+# Ad-hoc groupings after a run, from the saved calendar cube (no raw data needed):
+#   from weather import query_cube
+#   query_cube(['season', 'hour'], {'temperature': ['mean', 'max']}, where={'location': 'London'})
+
+OUTPUT_DIR = Path("./weather_analysis_output")
+CSV_FILENAME = "weather_1.csv"
+
+# Per-location mode: outputs go to OUTPUT_DIR/locations/<location>/, indexed in locations_index.csv
+LOCATIONS_DIR = "locations"
+LOCATIONS_INDEX = "locations_index.csv"
+
+# Rows per chunk for the streaming de-duplication pass
+DEDUP_CHUNKSIZE = 100_000
+
+# --- De-duplication (streaming, before anything is parsed) ---
+# Feeds repeat identical observations. Each row (location, observation time and
+# all values, as raw text) is reduced to a 64-bit hash, and only the first
+# occurrence is kept. The file is read chunk by chunk and the distinct rows are
+# written to dedup_path, so memory is bounded by one chunk plus 8 bytes per
+# distinct row. Seen hashes are kept as sorted arrays: one large array plus the
+# sorted hashes of recent chunks, each checked with a binary search. The recent
+# runs are merged into the large array only once they add up to a quarter of
+# it (or there are too many), so the large array is not copied every chunk.
+DEDUP_MAX_RUNS = 8
+
+def in_sorted(sorted_hashes, hashes):
+    if not len(sorted_hashes):
+        return np.zeros(len(hashes), dtype=bool)
+    pos = np.searchsorted(sorted_hashes, hashes)
+    return sorted_hashes[np.minimum(pos, len(sorted_hashes) - 1)] == hashes
+
+def deduplicate_csv(csv_path, dedup_path, chunksize=DEDUP_CHUNKSIZE):
+    seen = np.empty(0, dtype=np.uint64)
+    runs = [] # sorted hashes of recent chunks, not yet merged into seen
+    rows_read = rows_kept = 0
+    with open(dedup_path, "w", newline="", encoding="utf-8") as out:
+        pd.read_csv(csv_path, nrows=0).to_csv(out, index=False)
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+            keep = ~pd.Series(hashes).duplicated().to_numpy()
+            for sorted_hashes in [seen, *runs]:
+                keep &= ~in_sorted(sorted_hashes, hashes)
+            chunk[keep].to_csv(out, index=False, header=False)
+            runs.append(np.sort(hashes[keep]))
+            if len(runs) > DEDUP_MAX_RUNS or sum(len(r) for r in runs) * 4 > len(seen):
+                seen = np.sort(np.concatenate([seen, *runs]))
+                runs = []
+            rows_read += len(chunk)
+            rows_kept += int(keep.sum())
+    return rows_read, rows_read - rows_kept
+
+# --- Robust column detection by substring ---
+def detect_by_substrings(columns, subs):
+    for col, lc in {c: c.lower().strip() for c in columns}.items():
+        for s in subs:
+            if s in lc:
+                return col
+    return None
+
+def detect_columns(df):
+    cols = {
+        'date': detect_by_substrings(df.columns, ["date", "time", "observation", "timestamp"]),
+        'temp': detect_by_substrings(df.columns, ["temp", "temperature", "°c", "tmean"]),
+        'min_temp': detect_by_substrings(df.columns, ["min_temp", "mintemp", "minimum", "tmin", "min temp"]),
+        'max_temp': detect_by_substrings(df.columns, ["max_temp", "maxtemp", "maximum", "tmax", "max temp"]),
+        'rain': detect_by_substrings(df.columns, ["rain", "precip", "precipitation"]),
+        'humidity': detect_by_substrings(df.columns, ["humid", "humidity", "rel_humidity", "rh", "%"]),
+        'location': detect_by_substrings(df.columns, ["location", "city", "station"]),
+    }
+
+    print("\nDetected (best-effort):")
+    print(" date_col:", cols['date'])
+    print(" temp_col:", cols['temp'])
+    print(" min_temp_col:", cols['min_temp'])
+    print(" max_temp_col:", cols['max_temp'])
+    print(" rain_col:", cols['rain'])
+    print(" humidity_col:", cols['humidity'])
+    print(" location_col:", cols['location'])
+
+    # If nothing for date, fallback to first column
+    if cols['date'] is None:
+        cols['date'] = list(df.columns)[0]
+        print("No obvious date column — using first column:", cols['date'])
+    return cols
+
+# --- Parse datetime: sniff the format once, parse each distinct string once ---
+# Observation feeds repeat the same timestamps many times, so only the unique
+# strings are parsed. The format is guessed from an evenly spaced sample of them
+# and the whole set is parsed in one vectorized pass; the few strings that do not
+# fit it (the residual) fall back to pandas' per-element 'mixed' parsing.
+DATE_SNIFF_SAMPLE = 200
+COMMON_DATE_FORMATS = ["%Y-%m-%d %H:%M", "%Y-%m-%d", "%m/%d/%Y %H:%M", "%d/%m/%Y %H:%M", "%m/%d/%Y", "%d/%m/%Y"]
+
+def swap_day_month(fmt):
+    return fmt.replace('%d', '\0').replace('%m', '%d').replace('\0', '%m')
+
+# values with a time zone (e.g. a stray "...Z") are converted to UTC and made naive,
+# so the column stays datetime64[ns] instead of turning into objects
+def to_naive_datetimes(values, fmt, **kwargs):
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce', utc=True, **kwargs)
+    return parsed.dt.tz_localize(None).copy()
+
+def sniff_date_format(values):
+    # candidates: pandas' guesses (month-first, then day-first) for a few values, then the common formats
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning) # "format is not day-first" notices
+        for v in values[:20]:
+            for dayfirst in (False, True):
+                fmt = guess_datetime_format(v, dayfirst=dayfirst)
+                if fmt and fmt not in candidates:
+                    candidates.append(fmt)
+    candidates += [f for f in COMMON_DATE_FORMATS if f not in candidates]
+    sample = pd.Series(values)
+    scores = {f: to_naive_datetimes(sample, f).notna().sum() for f in candidates}
+    best = max(candidates, key=lambda f: scores[f]) # first candidate wins ties, so month-first as before
+    return best if scores[best] > 0 else None
+
+def parse_dates(series):
+    codes, uniques = pd.factorize(series.astype(str).where(series.notna()))
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    uniques = pd.Series(uniques)
+    parsed_uniques = pd.Series(pd.NaT, index=uniques.index, dtype='datetime64[ns]')
+    sample_idx = np.unique(np.linspace(0, len(uniques) - 1, min(DATE_SNIFF_SAMPLE, len(uniques))).astype(int))
+    fmt = sniff_date_format(uniques.iloc[sample_idx].tolist())
+    dayfirst = False
+    if fmt is not None:
+        parsed_uniques = to_naive_datetimes(uniques, fmt)
+        dayfirst = fmt.find('%d') != -1 and fmt.find('%d') < fmt.find('%m')
+        print(f"\nDate format: {fmt} ({len(uniques)} distinct values)")
+        # day/month ambiguity: strings that also parse, to a different date, with day and month swapped
+        swapped = swap_day_month(fmt)
+        if swapped != fmt:
+            alt = to_naive_datetimes(uniques, swapped)
+            ambiguous = (parsed_uniques.notna() & alt.notna() & (parsed_uniques != alt)).sum()
+            if ambiguous and alt.notna().sum() >= parsed_uniques.notna().sum():
+                print(f"WARNING: day/month order is ambiguous: all {parsed_uniques.notna().sum()} values also parse as {swapped}; "
+                      f"assuming {fmt} ({ambiguous} values would give a different date).")
+            elif ambiguous:
+                print(f"Note: {ambiguous} values also fit {swapped}; {fmt} chosen because more values match it.")
+    residual = parsed_uniques.isna() & uniques.notna()
+    if residual.any():
+        parsed_uniques[residual] = to_naive_datetimes(uniques[residual], 'mixed', dayfirst=dayfirst).to_numpy()
+        print(f"{residual.sum()} distinct values did not match the format; "
+              f"{parsed_uniques[residual].notna().sum()} of them parsed individually.")
+    result = parsed_uniques.to_numpy()[codes]
+    result[codes < 0] = np.datetime64('NaT')
+    return pd.Series(result, index=series.index)
+
+# --- Cleaning: parse dates, standardize numeric columns, fill gaps ---
+def clean_weather(df, cols):
+    date_col, temp_col, min_temp_col, max_temp_col = cols['date'], cols['temp'], cols['min_temp'], cols['max_temp']
+    rain_col, humidity_col = cols['rain'], cols['humidity']
+    df = df.copy()
+    df[date_col] = parse_dates(df[date_col])
+    n_valid_dates = df[date_col].notna().sum()
+    print(f"\nParsed dates: {n_valid_dates}/{len(df)} valid.")
+
+    # drop rows where date couldn't be parsed
+    initial_len = len(df)
+    df = df[df[date_col].notna()].copy()
+    dropped = initial_len - len(df)
+    print(f"Dropped {dropped} rows with invalid dates.")
+
+    # --- Standardize numeric columns (create canonical names if possible) ---
+    def to_numeric_col(name, canonical):
+        if name is None:
+            return False
+        if name in df.columns:
+            df[canonical] = pd.to_numeric(df[name], errors='coerce')
+            return True
+        return False
+
+    created_temp = False
+    if temp_col and temp_col in df.columns:
+        created_temp = to_numeric_col(temp_col, "temperature")
+
+    # if mean not present but min+max present compute mean
+    if not created_temp and min_temp_col and max_temp_col and min_temp_col in df.columns and max_temp_col in df.columns:
+        df["min_temperature"] = pd.to_numeric(df[min_temp_col], errors='coerce')
+        df["max_temperature"] = pd.to_numeric(df[max_temp_col], errors='coerce')
+        df["temperature"] = df[["min_temperature", "max_temperature"]].mean(axis=1)
+        created_temp = True
+    else:
+        # individually create min/max if present
+        if min_temp_col and min_temp_col in df.columns:
+            df["min_temperature"] = pd.to_numeric(df[min_temp_col], errors='coerce')
+        if max_temp_col and max_temp_col in df.columns:
+            df["max_temperature"] = pd.to_numeric(df[max_temp_col], errors='coerce')
+
+    created_rain = to_numeric_col(rain_col, "rainfall")
+    created_humidity = to_numeric_col(humidity_col, "humidity")
+    # fallback defaults
+    if "rainfall" not in df.columns:
+        df["rainfall"] = 0.0
+    if "humidity" not in df.columns:
+        df["humidity"] = np.nan
+
+    # set index
+    df.sort_values(by=date_col, inplace=True)
+    df.set_index(date_col, inplace=True)
+
+    # fill numeric missing values: ffill,bfill, mean
+    for c in ["temperature", "min_temperature", "max_temperature", "rainfall", "humidity"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce')
+            df[c] = df[c].ffill().bfill()
+            if df[c].isna().any():
+                df[c].fillna(df[c].mean(skipna=True), inplace=True)
+    return df
+
+# --- Daily partial aggregates (one pass over the rows) ---
+# Per metric and calendar day: count, sum, sum of squares, min and max. These
+# merge by adding (or min/max), so the monthly, yearly, month-of-year and
+# season summaries are rolled up from the daily partials instead of rescanning df.
+# Squares are taken about a reference value per metric (its overall mean) so the
+# variance does not lose precision when sum**2/n is subtracted.
+def metric_refs(frame, metrics):
+    return {m: (float(frame[m].mean()) if frame[m].notna().any() else 0.0) for m in metrics}
+
+def compute_partials(frame, metrics, refs, group):
+    # group(work) returns the resampler/groupby to aggregate; columns come out as <metric>_<stat>
+    work = pd.DataFrame({'rows': 1}, index=frame.index)
+    spec = {'rows': ['sum']}
+    for m in metrics:
+        work[m] = frame[m]
+        work[f"{m}_sq"] = (frame[m] - refs[m]) ** 2
+        spec[m] = ['count', 'sum', 'min', 'max']
+        spec[f"{m}_sq"] = ['sum']
+    partials = group(work).agg(spec)
+    partials.columns = [f"{col}_{stat}" if stat != 'sum' or not col.endswith('_sq') else f"{col[:-3]}_sumsq"
+                        for col, stat in partials.columns.values]
+    return partials.rename(columns={'rows_sum': 'rows'})
+
+def daily_partials(frame, metrics):
+    refs = metric_refs(frame, metrics)
+    return compute_partials(frame, metrics, refs, lambda work: work.resample('D')), refs
+
+def merge_partials(grouped):
+    # min/max columns merge with min/max, everything else adds up
+    return grouped.agg({
+        c: ('min' if c.endswith('_min') else 'max' if c.endswith('_max') else 'sum')
+        for c in grouped.obj.columns
+    })
+
+def finalize_partials(partials, spec, refs, dtypes):
+    # turns merged partials into the <metric>_<stat> columns pandas .agg(spec) would produce
+    out = pd.DataFrame(index=partials.index)
+    for m, stats in spec.items():
+        n = partials[f"{m}_count"]
+        total = partials[f"{m}_sum"]
+        for stat in stats:
+            if stat == 'sum':
+                out[f"{m}_sum"] = total
+            elif stat == 'mean':
+                out[f"{m}_mean"] = total / n.where(n > 0)
+            elif stat in ('min', 'max'):
+                col = partials[f"{m}_{stat}"]
+                # pandas keeps integer columns integer when no group is empty
+                if pd.api.types.is_integer_dtype(dtypes[m]) and col.notna().all():
+                    col = col.astype(dtypes[m])
+                out[f"{m}_{stat}"] = col
+            elif stat == 'std':
+                shifted = total - n * refs[m]
+                var = (partials[f"{m}_sumsq"] - shifted ** 2 / n.where(n > 0)) / (n - 1).where(n > 1)
+                var = var.clip(lower=0).where(partials[f"{m}_min"] != partials[f"{m}_max"], 0.0)
+                out[f"{m}_std"] = np.sqrt(var).where(n > 1)
+    return out
+
+# --- Summaries: cleaned export plus daily / monthly / yearly ---
+def summarize_weather(df, output_dir):
+    # export cleaned
+    cleaned_path = output_dir / "cleaned_weather_1.csv"
+    df.to_csv(cleaned_path)
+    print("\nCleaned data exported to:", cleaned_path)
+
+    # --- Build aggregation dict dynamically only for columns that exist ---
+    agg_map = {}
+    if "temperature" in df.columns:
+        agg_map["temperature"] = ['mean', 'min', 'max', 'std']
+    if "rainfall" in df.columns:
+        agg_map["rainfall"] = ['sum', 'mean', 'std']
+    if "humidity" in df.columns:
+        agg_map["humidity"] = ['mean', 'min', 'max', 'std']
+
+    if not agg_map:
+        raise ValueError("No numeric columns detected for aggregation (temperature/rainfall/humidity).")
+
+    partials, partial_refs = daily_partials(df, list(agg_map))
+    metric_dtypes = df[list(agg_map)].dtypes
+
+    # daily / monthly / yearly
+    daily = finalize_partials(partials, agg_map, partial_refs, metric_dtypes)
+    daily.to_csv(output_dir / "daily_summary.csv")
+    print("Daily summary saved.")
+
+    monthly = finalize_partials(merge_partials(partials.resample('M')), agg_map, partial_refs, metric_dtypes)
+    monthly.to_csv(output_dir / "monthly_summary.csv")
+    print("Monthly summary saved.")
+
+    yearly = finalize_partials(merge_partials(partials.resample('Y')), agg_map, partial_refs, metric_dtypes)
+    yearly.to_csv(output_dir / "yearly_summary.csv")
+    print("Yearly summary saved.")
+    return agg_map, partials, partial_refs, metric_dtypes, daily, monthly, yearly
+
+# --- Plots (only create plots if required series exist) ---
+def plot_weather(daily, monthly, output_dir):
+    plt.close('all')
+    # daily temperature line
+    if 'temperature_mean' in daily.columns:
+        plt.figure(figsize=(10,4))
+        plt.plot(daily.index, daily['temperature_mean'])
+        plt.title("Daily Mean Temperature")
+        plt.xlabel("Date")
+        plt.ylabel("Temperature")
+        plt.tight_layout()
+        plt.savefig(output_dir / "daily_mean_temperature.png")
+        plt.close()
+        print("Saved: daily_mean_temperature.png")
+
+    # monthly rainfall bar
+    if 'rainfall_sum' in monthly.columns:
+        plt.figure(figsize=(10,4))
+        months = monthly.index.strftime('%Y-%m')
+        plt.bar(months, monthly['rainfall_sum'])
+        plt.xticks(rotation=45, ha='right')
+        plt.title("Monthly Rainfall Totals")
+        plt.xlabel("Month")
+        plt.ylabel("Rainfall (sum)")
+        plt.tight_layout()
+        plt.savefig(output_dir / "monthly_rainfall_totals.png")
+        plt.close()
+        print("Saved: monthly_rainfall_totals.png")
+
+    # scatter humidity vs temp (daily)
+    if 'temperature_mean' in daily.columns and 'humidity_mean' in daily.columns:
+        plt.figure(figsize=(6,6))
+        plt.scatter(daily['temperature_mean'], daily['humidity_mean'])
+        plt.title("Humidity vs Temperature (daily means)")
+        plt.xlabel("Temperature (mean)")
+        plt.ylabel("Humidity (mean)")
+        plt.tight_layout()
+        plt.savefig(output_dir / "humidity_vs_temperature_scatter.png")
+        plt.close()
+        print("Saved: humidity_vs_temperature_scatter.png")
+
+    # combined monthly (temp & rainfall)
+    if 'temperature_mean' in monthly.columns and 'rainfall_sum' in monthly.columns:
+        fig, ax1 = plt.subplots(figsize=(10,5))
+        ax1.plot(monthly.index, monthly['temperature_mean'], label='Temp (mean)')
+        ax1.set_xlabel("Month")
+        ax1.set_ylabel("Monthly Mean Temperature")
+        ax1.set_xticks(monthly.index)
+        ax1.set_xticklabels(monthly.index.strftime('%Y-%m'), rotation=45, ha='right')
+        ax2 = ax1.twinx()
+        ax2.bar(monthly.index, monthly['rainfall_sum'], alpha=0.3, label='Rainfall (sum)')
+        ax2.set_ylabel("Monthly Rainfall (sum)")
+        plt.title("Monthly Mean Temperature and Rainfall (combined)")
+        plt.tight_layout()
+        plt.savefig(output_dir / "monthly_temp_rainfall_combined.png")
+        plt.close()
+        print("Saved: monthly_temp_rainfall_combined.png")
+
+# --- Calendar cube ---
+# Mergeable partials (the same columns as the daily partials) for every
+# location x year x month x day-of-week x hour cell, persisted as
+# calendar_cube.csv with the metric reference values and dtypes in
+# calendar_cube.json. query_cube answers any grouping over those dimensions
+# (plus 'season', derived from month) by merging cells, without the raw data.
+CUBE_FILE = "calendar_cube.csv"
+CUBE_META_FILE = "calendar_cube.json"
+CUBE_DIMS = ['location', 'year', 'month', 'dow', 'hour']
+
+def month_to_season(m):
+    if m in [12,1,2]: return 'DJF'
+    if m in [3,4,5]: return 'MAM'
+    if m in [6,7,8]: return 'JJA'
+    return 'SON'
+
+def build_calendar_cube(df, metrics, refs, dtypes, location_col, output_dir):
+    idx = df.index
+    keys = [
+        pd.Series(df[location_col].to_numpy() if location_col else 'all', index=idx, name='location'),
+        pd.Series(idx.year, index=idx, name='year'),
+        pd.Series(idx.month, index=idx, name='month'),
+        pd.Series(idx.dayofweek, index=idx, name='dow'),
+        pd.Series(idx.hour, index=idx, name='hour'),
+    ]
+    cube = compute_partials(df, metrics, refs, lambda work: work.groupby(keys, dropna=False)).reset_index()
+    meta = {'metrics': list(metrics), 'refs': refs, 'dtypes': {m: str(dtypes[m]) for m in metrics}}
+    cube.to_csv(output_dir / CUBE_FILE, index=False)
+    with open(output_dir / CUBE_META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    print(f"Saved: {CUBE_FILE} ({len(cube)} cells)")
+    return cube, meta
+
+_loaded_cubes = {}
+
+def load_calendar_cube(output_dir=OUTPUT_DIR):
+    # cached per folder until the cube file changes
+    path = Path(output_dir) / CUBE_FILE
+    mtime = path.stat().st_mtime_ns
+    if path not in _loaded_cubes or _loaded_cubes[path][0] != mtime:
+        with open(Path(output_dir) / CUBE_META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        _loaded_cubes[path] = (mtime, (pd.read_csv(path, keep_default_na=False, na_values=['']), meta))
+    return _loaded_cubes[path][1]
+
+def query_cube(by, spec, where=None, cube=None, output_dir=OUTPUT_DIR):
+    # by: dimension names from CUBE_DIMS or 'season'; spec: {metric: [stats]} like agg_map;
+    # where: {dimension: value or list of values} filters applied before grouping
+    cube, meta = cube if cube is not None else load_calendar_cube(output_dir)
+    cells = cube
+    if 'season' in by or (where and 'season' in where):
+        cells = cells.assign(season=cells['month'].map(month_to_season))
+    for dim, values in (where or {}).items():
+        cells = cells[cells[dim].isin(values if isinstance(values, (list, tuple, set)) else [values])]
+    keys = [cells[dim] for dim in by]
+    merged = merge_partials(cells.drop(columns=[c for c in cells.columns if c in CUBE_DIMS or c == 'season']).groupby(keys))
+    return finalize_partials(merged, spec, meta['refs'], {m: np.dtype(t) for m, t in meta['dtypes'].items()})
+
+# --- Group by month and season (answered from the calendar cube) ---
+def group_weather(cube, agg_map, output_dir):
+    group_agg_map = {
+        k: (['mean','min','max','std'] if k=='temperature' else (['sum','mean'] if k=='rainfall' else ['mean','min','max']))
+        for k in ['temperature','rainfall','humidity'] if k in agg_map
+    }
+    grouped_by_month = query_cube(['month'], group_agg_map, cube=cube)
+    if not grouped_by_month.empty:
+        grouped_by_month.to_csv(output_dir / "grouped_by_month.csv")
+        print("Saved: grouped_by_month.csv")
+
+    grouped_by_season = query_cube(['season'], group_agg_map, cube=cube)
+    if not grouped_by_season.empty:
+        grouped_by_season.to_csv(output_dir / "grouped_by_season.csv")
+        print("Saved: grouped_by_season.csv")
+
+# --- Report ---
+def write_report(df, daily, monthly, output_dir, duplicates_removed=None):
+    report_path = output_dir / "report.md"
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write("# Weather Analysis Report\n\n")
+        f.write(f"Source file: `{CSV_FILENAME}`\n\n")
+        if duplicates_removed is not None:
+            f.write(f"Duplicate rows removed: {duplicates_removed}\n\n")
+        f.write(f"Rows after cleaning: {len(df)}\n\n")
+        if len(df)>0:
+            f.write(f"Date range: {df.index.min().date()} to {df.index.max().date()}\n\n")
+        f.write("Files generated:\n\n")
+        for p in sorted(output_dir.iterdir()):
+            f.write(f"- `{p.name}`\n")
+        f.write("\nAutomatic insights:\n\n")
+        try:
+            if 'temperature_max' in daily.columns:
+                hottest = daily['temperature_max'].idxmax().date()
+                f.write(f"- Hottest day (daily max): {hottest}\n")
+            if 'rainfall_sum' in monthly.columns:
+                wettest = monthly['rainfall_sum'].idxmax().strftime('%Y-%m')
+                f.write(f"- Wettest month: {wettest}\n")
+        except Exception:
+            f.write("- Some insights could not be computed.\n")
+    print("\nReport written to", report_path)
+
+# --- Per-location mode ---
+# Each location is cleaned, gap-filled and aggregated on its own time index, so
+# ffill/bfill and the resamples never mix cities. Locations run in parallel
+# worker processes; the parent only splits the rows and writes the index.
+def location_slug(location):
+    return re.sub(r'[^0-9A-Za-z]+', '_', str(location)).strip('_').lower() or "unknown"
+
+def process_location(location, frame, cols, output_dir):
+    # worker: quiet version of the single-file pipeline for one location
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = clean_weather(frame, cols)
+        if len(cleaned):
+            summarize_weather(cleaned, output_dir)
+    return {
+        'Location': location,
+        'folder': output_dir.relative_to(OUTPUT_DIR).as_posix(),
+        'rows': len(cleaned),
+        'dropped_rows': len(frame) - len(cleaned),
+        'first_observation': cleaned.index.min() if len(cleaned) else pd.NaT,
+        'last_observation': cleaned.index.max() if len(cleaned) else pd.NaT,
+    }
+
+def run_per_location(df, cols, workers=None):
+    location_col = cols['location']
+    if location_col is None:
+        raise ValueError("Per-location mode needs a location column (location/city/station).")
+    groups = [(loc, frame) for loc, frame in df.groupby(location_col, sort=True, dropna=False)]
+    folders = {}
+    for loc, _ in groups:
+        slug = location_slug(loc)
+        while slug in folders.values():
+            slug += "_"
+        folders[loc] = OUTPUT_DIR / LOCATIONS_DIR / slug
+    workers = workers or min(len(groups), os.cpu_count() or 1)
+    print(f"\nProcessing {len(groups)} locations with {workers} worker process(es)...")
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process_location, loc, frame, cols, folders[loc]) for loc, frame in groups]
+            rows = [f.result() for f in futures]
+    else:
+        rows = [process_location(loc, frame, cols, folders[loc]) for loc, frame in groups]
+    index = pd.DataFrame(rows)
+    index.to_csv(OUTPUT_DIR / LOCATIONS_INDEX, index=False)
+    for row in rows:
+        print(f" - {row['Location']}: {row['rows']} rows -> {row['folder']}")
+    print("Saved:", LOCATIONS_INDEX)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean and summarize weather observations.")
+    parser.add_argument("--per-location", action="store_true", help="process each location separately in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for --per-location (default: CPU count)")
+    parser.add_argument("--keep-duplicates", action="store_true", help="do not drop repeated identical rows")
+    args = parser.parse_args()
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    if not Path(CSV_FILENAME).exists():
+        raise FileNotFoundError(f"Expected file '{CSV_FILENAME}' in the current working directory.")
+
+    # --- De-duplicate and load ---
+    duplicates_removed = None
+    if args.keep_duplicates:
+        df = pd.read_csv(CSV_FILENAME)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            dedup_path = Path(tmp) / CSV_FILENAME
+            rows_read, duplicates_removed = deduplicate_csv(CSV_FILENAME, dedup_path)
+            df = pd.read_csv(dedup_path)
+        print(f"De-duplication: removed {duplicates_removed} of {rows_read} rows ({len(df)} distinct observations).")
+    print("Loaded CSV. Columns:")
+    for c in df.columns:
+        print(" -", c)
+    cols = detect_columns(df)
+
+    if args.per_location:
+        run_per_location(df, cols, args.workers)
+    else:
+        df = clean_weather(df, cols)
+        agg_map, partials, partial_refs, metric_dtypes, daily, monthly, yearly = summarize_weather(df, OUTPUT_DIR)
+        plot_weather(daily, monthly, OUTPUT_DIR)
+        cube = build_calendar_cube(df, list(agg_map), partial_refs, metric_dtypes, cols['location'], OUTPUT_DIR)
+        group_weather(cube, agg_map, OUTPUT_DIR)
+        write_report(df, daily, monthly, OUTPUT_DIR, duplicates_removed)
+    print("\nAll done — outputs are in:", OUTPUT_DIR.resolve())
+
+if __name__ == "__main__":
+    main()
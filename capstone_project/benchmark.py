@@ -0,0 +1,224 @@
+# benchmark.py
+#
+# Times each stage of the energy pipeline on a synthetic dataset, records
+# peak memory, and compares the results against a stored baseline.
+#
+# Examples:
+#   python benchmark.py --buildings 20 --months 6 --save-baseline
+#   python benchmark.py --buildings 20 --months 6          # exits 1 on regression
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Allow importing the pipeline and the generator from this folder
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import main as pipeline
+from generate_data import generate_dataset
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+MAIN_SCRIPT = Path(__file__).resolve().parent / "main.py"
+
+# Target for `python main.py --help`: interpreter start + pandas/numpy import,
+# with no plotting stack and no filesystem side effects
+STARTUP_TARGET_S = 1.0
+
+def _run_stages(state):
+    """
+    Yields (stage name, callable) in pipeline order. Each callable stores its
+    result in `state` so later stages receive the same inputs as in main().
+    """
+    def ingest():
+        state['df'] = pipeline.ingest_and_validate_data()
+
+    def daily():
+        state['daily'] = pipeline.calculate_daily_totals(state['df'])
+
+    def weekly():
+        state['weekly'] = pipeline.calculate_weekly_aggregates(state['df'])
+
+    def summary():
+        state['summary'], _ = pipeline.building_wise_summary(state['df'])
+
+    def populate_manager():
+        state['manager'] = pipeline.BuildingManager()
+        state['manager'].add_data_from_dataframe(state['df'])
+
+    def plots():
+        pipeline.generate_dashboard_plots(state['daily'], state['weekly'], state['df'])
+
+    def persist():
+        pipeline.persist_data(state['df'].reset_index(), state['summary'])
+
+    def peak_hour():
+        state['peak_hour'] = pipeline.EnergyRollup.from_dataframe(state['df']).peak_hour()
+
+    def executive_summary():
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.generate_executive_summary(
+                state['manager'], state['daily'], state['summary'], peak_hour=state['peak_hour']
+            )
+
+    yield 'ingest_and_validate_data', ingest
+    yield 'calculate_daily_totals', daily
+    yield 'calculate_weekly_aggregates', weekly
+    yield 'building_wise_summary', summary
+    yield 'BuildingManager.add_data_from_dataframe', populate_manager
+    yield 'generate_dashboard_plots', plots
+    yield 'persist_data', persist
+    yield 'EnergyRollup.peak_hour', peak_hour
+    yield 'generate_executive_summary', executive_summary
+
+def run_benchmark(repeat):
+    """Runs every stage `repeat` times for timing plus once under tracemalloc for memory."""
+    timings = {}
+    state = {}
+    for _ in range(repeat):
+        for name, stage in _run_stages(state):
+            start = time.perf_counter()
+            stage()
+            timings.setdefault(name, []).append(time.perf_counter() - start)
+
+    # Memory is measured in a separate pass because tracemalloc slows everything down
+    peaks = {}
+    state = {}
+    tracemalloc.start()
+    for name, stage in _run_stages(state):
+        tracemalloc.reset_peak()
+        stage()
+        peaks[name] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    stages = {
+        name: {
+            'median_s': statistics.median(times),
+            'min_s': min(times),
+            'peak_mb': peaks[name] / 2**20,
+        }
+        for name, times in timings.items()
+    }
+    checks = {
+        'rows': int(len(state['df'])),
+        'campus_total_kwh': round(state['manager'].calculate_campus_total(), 3),
+    }
+    return stages, checks
+
+def measure_startup(repeat):
+    """
+    Times `python main.py --help` in fresh interpreters (best of `repeat`)
+    and checks that importing main does not pull in the plotting stack.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(MAIN_SCRIPT), "--help"], check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    probe = (
+        f"import sys; sys.path.insert(0, {str(MAIN_SCRIPT.parent)!r}); import main; "
+        "print(any(m in sys.modules for m in ('matplotlib', 'seaborn')))"
+    )
+    imports_plotting = subprocess.run(
+        [sys.executable, "-c", probe], check=True, capture_output=True, text=True
+    ).stdout.strip() == "True"
+    return {'help_s': min(times), 'target_s': STARTUP_TARGET_S, 'imports_plotting': imports_plotting}
+
+def compare_to_baseline(result, baseline, tolerance):
+    """Returns a list of regression messages (empty if none)."""
+    problems = check_startup(result['startup'])
+    if baseline['config'] != result['config']:
+        problems.append(f"Baseline was recorded with a different config: {baseline['config']}")
+        return problems
+    if baseline['checks'] != result['checks']:
+        problems.append(f"Results changed: {baseline['checks']} -> {result['checks']}")
+    for name, stats in result['stages'].items():
+        old = baseline['stages'].get(name)
+        if old is None:
+            continue
+        for metric in ('median_s', 'peak_mb'):
+            if stats[metric] > old[metric] * (1 + tolerance) and stats[metric] - old[metric] > 0.01:
+                problems.append(
+                    f"{name}: {metric} {old[metric]:.3f} -> {stats[metric]:.3f} "
+                    f"(+{stats[metric] / old[metric] - 1:.0%})"
+                )
+    return problems
+
+def check_startup(startup):
+    """Returns problems with the startup measurement (independent of any baseline)."""
+    problems = []
+    if startup['help_s'] > startup['target_s']:
+        problems.append(f"startup: main.py --help took {startup['help_s']:.2f}s (target {startup['target_s']:.2f}s)")
+    if startup['imports_plotting']:
+        problems.append("startup: importing main loads matplotlib/seaborn")
+    return problems
+
+def print_report(result, baseline):
+    print(f"\n{'Stage':<42}{'median s':>10}{'min s':>10}{'peak MB':>10}{'vs base':>10}")
+    for name, stats in result['stages'].items():
+        change = ""
+        if baseline and name in baseline['stages'] and baseline['stages'][name]['median_s'] > 0:
+            change = f"{stats['median_s'] / baseline['stages'][name]['median_s'] - 1:+.0%}"
+        print(f"{name:<42}{stats['median_s']:>10.3f}{stats['min_s']:>10.3f}{stats['peak_mb']:>10.1f}{change:>10}")
+    total = sum(s['median_s'] for s in result['stages'].values())
+    print(f"{'total':<42}{total:>10.3f}")
+    startup = result['startup']
+    print(f"\nStartup (main.py --help): {startup['help_s']:.3f}s, target {startup['target_s']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the energy pipeline stages.")
+    parser.add_argument("--buildings", type=int, default=10)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--interval", type=int, default=15, help="minutes between readings")
+    parser.add_argument("--corrupt", type=float, default=0.001, help="fraction of corrupt lines")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', force=True)
+    config = {
+        'buildings': args.buildings, 'months': args.months,
+        'interval': args.interval, 'corrupt': args.corrupt,
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        generate_dataset(workdir / "data", args.buildings, args.months, args.interval, args.corrupt)
+        pipeline.DATA_DIR = workdir / "data"
+        pipeline.OUTPUT_DIR = workdir / "output"
+        pipeline.OUTPUT_DIR.mkdir()
+        stages, checks = run_benchmark(args.repeat)
+
+    result = {'config': config, 'checks': checks, 'stages': stages, 'startup': measure_startup(args.repeat)}
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    print_report(result, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+        problems = check_startup(result['startup'])
+    else:
+        problems = compare_to_baseline(result, baseline, args.tolerance)
+    if problems:
+        print("\nREGRESSIONS:")
+        for problem in problems:
+            print(" -", problem)
+        return 1
+    print("\nNo regressions found.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
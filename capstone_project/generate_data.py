@@ -0,0 +1,107 @@
+# generate_data.py
+#
+# Writes synthetic building meter exports in the same layout as
+# building_*_usage.csv, for load testing the energy pipeline.
+#
+# Example:
+#   python generate_data.py --buildings 50 --months 12 --interval 15 --corrupt 0.001 --output-dir data
+
+import argparse
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Kinds of corrupt lines mixed into the output, in the ratio they are drawn
+CORRUPTIONS = {
+    'extra_fields': 0.4,    # too many fields -> skipped by on_bad_lines='skip'
+    'bad_timestamp': 0.3,   # unparseable timestamp -> dropped during cleaning
+    'bad_kwh': 0.3,         # non-numeric reading -> dropped during cleaning
+}
+
+def building_name(index):
+    """Building names used in the generated filenames: B001, B002, ..."""
+    return f"B{index + 1:03d}"
+
+def generate_readings(start, months, interval_minutes, rng):
+    """Returns (timestamps, kwh) with a daily load curve, weekend dip and noise."""
+    start = pd.Timestamp(start)
+    end = start + pd.DateOffset(months=months)
+    timestamps = pd.date_range(start, end, freq=f"{interval_minutes}min", inclusive='left')
+
+    hours = timestamps.hour.to_numpy() + timestamps.minute.to_numpy() / 60
+    base = rng.uniform(5, 20)
+    daily_curve = np.clip(np.sin((hours - 6) / 24 * 2 * np.pi), 0, None) * rng.uniform(10, 30)
+    weekend = np.where(timestamps.dayofweek.to_numpy() >= 5, 0.6, 1.0)
+    noise = rng.normal(0, 1.5, len(timestamps))
+    kwh = np.clip((base + daily_curve) * weekend + noise, 0, None) * interval_minutes / 60
+    return timestamps, np.round(kwh, 3)
+
+def corrupt_lines(lines, fraction, rng):
+    """Replaces about `fraction` of the data lines with corrupt ones, in place. Returns the count."""
+    n_corrupt = int(round(len(lines) * fraction))
+    if n_corrupt == 0:
+        return 0
+    rows = rng.choice(len(lines), size=n_corrupt, replace=False)
+    kinds = rng.choice(list(CORRUPTIONS), size=n_corrupt, p=list(CORRUPTIONS.values()))
+    for row, kind in zip(rows, kinds):
+        timestamp, kwh = lines[row].split(",", 1)
+        if kind == 'extra_fields':
+            lines[row] = f"{timestamp},{kwh},meter_fault,1"
+        elif kind == 'bad_timestamp':
+            lines[row] = f"not-a-date,{kwh}"
+        else:
+            lines[row] = f"{timestamp},n/a"
+    return n_corrupt
+
+def write_building_file(path, start, months, interval_minutes, corrupt_fraction, rng):
+    """Writes one building CSV and returns (rows written, corrupt rows)."""
+    timestamps, kwh = generate_readings(start, months, interval_minutes, rng)
+    lines = np.char.add(
+        np.char.add(timestamps.strftime('%Y-%m-%d %H:%M:%S').to_numpy().astype(str), ","),
+        np.char.mod('%.3f', kwh),
+    ).tolist()
+    n_corrupt = corrupt_lines(lines, corrupt_fraction, rng)
+    with open(path, "w") as f:
+        f.write("Timestamp,kwh\n")
+        f.write("\n".join(lines))
+        f.write("\n")
+    return len(lines), n_corrupt
+
+def generate_dataset(output_dir, buildings, months, interval_minutes=15,
+                     corrupt_fraction=0.0, start="2024-01-01", seed=0):
+    """Writes `buildings` files of `months` months each into output_dir. Returns the file paths."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    total_rows = total_corrupt = 0
+    for i in range(buildings):
+        path = output_dir / f"building_{building_name(i)}_usage.csv"
+        rows, corrupt = write_building_file(path, start, months, interval_minutes, corrupt_fraction, rng)
+        total_rows += rows
+        total_corrupt += corrupt
+        paths.append(path)
+    logging.info(
+        f"Generated {len(paths)} files in {output_dir}: {total_rows:,} rows, {total_corrupt:,} corrupt."
+    )
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic building meter CSVs.")
+    parser.add_argument("--buildings", type=int, default=10, help="number of building files")
+    parser.add_argument("--months", type=int, default=3, help="months of readings per building")
+    parser.add_argument("--interval", type=int, default=15, help="minutes between readings")
+    parser.add_argument("--corrupt", type=float, default=0.001, help="fraction of corrupt lines (0-1)")
+    parser.add_argument("--start", default="2024-01-01", help="first timestamp")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output-dir", default="data", help="where to write the CSV files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    generate_dataset(args.output_dir, args.buildings, args.months, args.interval,
+                     args.corrupt, args.start, args.seed)
+
+if __name__ == "__main__":
+    main()
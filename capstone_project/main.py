@@ -1,318 +1,2794 @@
-# main.py
-
-import pandas as pd
-import os
-import logging
-import matplotlib.pyplot as plt
-import seaborn as sns
-from pathlib import Path
-
-# --- 0. Setup and Configuration ---
-# Setup basic logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-# Define input/output directories
-DATA_DIR = Path("data")
-OUTPUT_DIR = Path("output")
-OUTPUT_DIR.mkdir(exist_ok=True) # Ensure the output directory exists
-
-# --- Task 1: Data Ingestion and Validation ---
-
-def ingest_and_validate_data():
-    """Reads multiple CSV files, handles errors, and combines them into one clean DataFrame."""
-    logging.info("Starting Task 1: Data Ingestion and Validation.")
-    df_combined = pd.DataFrame()
-    
-    if not DATA_DIR.is_dir():
-        logging.error(f"Data directory not found at {DATA_DIR}. Please create it and add CSV files.")
-        return None
-        
-    csv_files = list(DATA_DIR.glob("*.csv"))
-    if not csv_files:
-        logging.warning(f"No CSV files found in {DATA_DIR}.")
-        return None
-        
-    for file_path in csv_files:
-        file_name = file_path.name
-        try:
-            # 1. Infer metadata from filename (Assumes format like 'building_A_month.csv')
-            parts = file_name.replace(".csv", "").split("_")
-            building_name = parts[1].upper() if len(parts) > 1 else "UNKNOWN"
-            
-            # 2. Read file, skipping bad lines
-            # Assuming the raw files have at least two columns: [Timestamp, kwh]
-            df = pd.read_csv(
-                file_path, 
-                on_bad_lines='skip', # Handles corrupt data by skipping bad lines
-                low_memory=False
-            )
-            
-            # 3. Rename/Assign core columns based on expected structure
-            if len(df.columns) < 2:
-                 raise ValueError("File must contain at least two columns: Timestamp and kwh.")
-                 
-            df.rename(columns={df.columns[0]: 'Timestamp', df.columns[1]: 'kwh'}, inplace=True)
-            df['Building'] = building_name
-            
-            df_combined = pd.concat([df_combined, df], ignore_index=True)
-            logging.info(f"Successfully ingested and validated: {file_name}")
-
-        except FileNotFoundError:
-            logging.error(f"Missing file error: {file_name}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred while processing {file_name}: {e}")
-
-    # 4. Clean and Prepare the combined data
-    if not df_combined.empty:
-        df_combined['Timestamp'] = pd.to_datetime(df_combined['Timestamp'], errors='coerce')
-        df_combined['kwh'] = pd.to_numeric(df_combined['kwh'], errors='coerce')
-        df_combined.dropna(subset=['Timestamp', 'kwh'], inplace=True)
-        df_combined.set_index('Timestamp', inplace=True)
-        logging.info("Task 1 complete: Data combined and cleaned.")
-        
-    return df_combined
-
-# --- Task 2: Core Aggregation Logic ---
-
-def calculate_daily_totals(df):
-    """Calculates total daily consumption per building."""
-    logging.info("Calculating daily totals.")
-    # Group by Building, then resample the Timestamp index to daily ('D') frequency and sum the kwh
-    df_daily = df.groupby('Building')['kwh'].resample('D').sum().reset_index()
-    df_daily.rename(columns={'kwh': 'Daily_kwh_Total'}, inplace=True)
-    return df_daily
-
-def calculate_weekly_aggregates(df):
-    """Calculates total weekly consumption per building."""
-    logging.info("Calculating weekly totals.")
-    # Group by Building, then resample the Timestamp index to weekly ('W') frequency and sum the kwh
-    df_weekly = df.groupby('Building')['kwh'].resample('W').sum().reset_index()
-    df_weekly.rename(columns={'kwh': 'Weekly_kwh_Total'}, inplace=True)
-    return df_weekly
-
-def building_wise_summary(df):
-    """Calculates mean, min, max, and total consumption for each building."""
-    logging.info("Calculating building-wise summary.")
-    building_summary_df = df.groupby('Building')['kwh'].agg(
-        Mean_kwh='mean',
-        Min_kwh='min',
-        Max_kwh='max',
-        Total_kwh='sum'
-    ).reset_index()
-    
-    # Store results in a dictionary (as per requirement)
-    summary_dict = building_summary_df.set_index('Building').T.to_dict('dict')
-    
-    return building_summary_df, summary_dict
-
-# --- Task 3: Object-Oriented Modeling ---
-
-class MeterReading:
-    """Represents a single meter reading at a specific time."""
-    def __init__(self, timestamp, kwh):
-        self.timestamp = pd.to_datetime(timestamp)
-        self.kwh = float(kwh)
-
-class Building:
-    """Represents a building with a collection of meter readings."""
-    def __init__(self, name):
-        self.name = name
-        self.meter_readings = []
-        
-    def add_reading(self, timestamp, kwh):
-        """Adds a new MeterReading instance to the building."""
-        try:
-            reading = MeterReading(timestamp, kwh)
-            self.meter_readings.append(reading)
-        except Exception:
-            # Skip invalid reading, logging handles detailed errors in Task 1
-            pass 
-        
-    def calculate_total_consumption(self):
-        """Calculates the sum of all kwh readings."""
-        return sum(r.kwh for r in self.meter_readings)
-
-    def generate_report(self):
-        """Generates a simple usage report string."""
-        total = self.calculate_total_consumption()
-        
-        report = (
-            f"--- Report for Building {self.name} ---\n"
-            f"Total Consumption: {total:,.2f} kWh\n"
-        )
-        return report
-
-
-class BuildingManager:
-    """Manages all Building objects and provides campus-wide statistics."""
-    def __init__(self):
-        self.buildings = {} # Stores Building objects: {'name': Building_Object}
-
-    def add_data_from_dataframe(self, df_combined):
-        """Populates the manager with data from the Task 1 DataFrame."""
-        logging.info("Task 3: Populating OOP model.")
-        
-        # Reset index to iterate over Timestamp and Building columns easily
-        df_iter = df_combined.reset_index()
-        
-        for name in df_iter['Building'].unique():
-            self.buildings[name] = Building(name)
-        
-        # Iterate over the rows and add readings to the correct building object
-        for _, row in df_iter.iterrows():
-            building_name = row['Building']
-            # Using the original Timestamp and kwh values
-            self.buildings[building_name].add_reading(row['Timestamp'], row['kwh'])
-
-    def calculate_campus_total(self):
-        """Calculates total consumption across all buildings."""
-        return sum(b.calculate_total_consumption() for b in self.buildings.values())
-
-
-# --- Task 4: Visual Output with Matplotlib ---
-
-def generate_dashboard_plots(df_daily, df_weekly, df_combined):
-    """Generates a three-panel dashboard and saves it as a PNG."""
-    logging.info("Starting Task 4: Generating visual output.")
-    
-    # --- Data Prep for Scatter Plot ---
-    # Resample to hourly to find the hour of the day with high usage
-    df_hourly = df_combined.groupby('Building')['kwh'].resample('H').sum().reset_index()
-    df_hourly['Hour'] = df_hourly['Timestamp'].dt.hour
-    
-    # Calculate the average hourly consumption per building for stability in the scatter plot
-    df_peak = df_hourly.groupby(['Building', 'Hour'])['kwh'].mean().reset_index()
-    
-    # Prepare data for Bar Chart (Average Weekly Usage)
-    avg_weekly = df_weekly.groupby('Building')['Weekly_kwh_Total'].mean().reset_index()
-
-    # --- Create Figure and Subplots ---
-    fig, axes = plt.subplots(3, 1, figsize=(12, 18))
-    plt.style.use('ggplot')
-    
-    # Plot 1: Trend Line (Daily Consumption)
-    sns.lineplot(data=df_daily, x='Timestamp', y='Daily_kwh_Total', hue='Building', ax=axes[0])
-    axes[0].set_title('1. Daily Total Energy Consumption Trend')
-    axes[0].set_ylabel('Total kWh')
-    axes[0].set_xlabel('Date')
-    
-    # Plot 2: Bar Chart (Average Weekly Usage)
-    sns.barplot(data=avg_weekly, x='Building', y='Weekly_kwh_Total', ax=axes[1], palette='viridis')
-    axes[1].set_title('2. Comparison of Average Weekly Consumption')
-    axes[1].set_ylabel('Average Weekly kWh')
-    axes[1].set_xlabel('Building Name')
-
-    # Plot 3: Scatter Plot (Average Consumption by Hour of Day)
-    sns.scatterplot(data=df_peak, x='Hour', y='kwh', hue='Building', ax=axes[2], s=100)
-    axes[2].set_title('3. Average Consumption by Hour of Day (Peak Load Indicator)')
-    axes[2].set_ylabel('Average Hourly kWh')
-    axes[2].set_xlabel('Hour of Day (0-23)')
-    axes[2].set_xticks(range(0, 24, 2))
-    
-    # Final layout adjustments
-    plt.tight_layout()
-    plt.savefig(OUTPUT_DIR / "dashboard.png")
-    logging.info("Task 4 complete: Dashboard image saved to output/dashboard.png")
-    plt.close(fig)
-
-# --- Task 5: Persistence and Executive Summary ---
-
-def persist_data(df_combined, df_summary):
-    """Exports processed data and summary statistics to CSV files."""
-    logging.info("Starting Task 5: Data Persistence.")
-    
-    # 1. Export Final processed dataset
-    df_combined.to_csv(OUTPUT_DIR / "cleaned_energy_data.csv")
-    logging.info("Exported cleaned_energy_data.csv")
-    
-    # 2. Export Summary stats
-    df_summary.to_csv(OUTPUT_DIR / "building_summary.csv", index=False)
-    logging.info("Exported building_summary.csv")
-
-def generate_executive_summary(manager, df_daily, df_summary):
-    """Creates a concise written report (summary.txt) based on analysis."""
-    
-    # 1. Calculate Core Metrics
-    total_campus_consumption = manager.calculate_campus_total()
-    
-    # Highest consuming building
-    highest_consumer_row = df_summary.loc[df_summary['Total_kwh'].idxmax()]
-    highest_consumer = highest_consumer_row['Building']
-    highest_kwh = highest_consumer_row['Total_kwh']
-    
-    # Peak Load Time (Find the hour of the day with the highest *average* usage)
-    df_hourly_overall = df_daily.reset_index().set_index('Timestamp')['Daily_kwh_Total'].resample('H').sum()
-    peak_hour_overall = df_hourly_overall.groupby(df_hourly_overall.index.hour).mean().idxmax()
-    
-    # Weekly/Daily Trends Assessment
-    daily_mean = df_daily['Daily_kwh_Total'].mean()
-    daily_std = df_daily['Daily_kwh_Total'].std()
-    
-    if daily_std / daily_mean > 0.2:
-        trend_note = "Significant variability in daily consumption, suggesting large operational swings or scheduling inefficiencies."
-    else:
-        trend_note = "Relatively stable daily consumption, indicating consistent usage patterns."
-    
-    # 2. Compile Report
-    summary_text = (
-        "=========================================\n"
-        "   ENERGY USAGE EXECUTIVE SUMMARY REPORT\n"
-        "=========================================\n\n"
-        
-        f"**1. Total Campus Consumption:**\n"
-        f"   Total recorded consumption: {total_campus_consumption:,.2f} kWh\n\n"
-        
-        f"**2. Highest Consuming Building:**\n"
-        f"   Building: **{highest_consumer}**\n"
-        f"   Total Consumption: {highest_kwh:,.2f} kWh (See building_summary.csv for details)\n\n"
-        
-        f"**3. Peak Load Time:**\n"
-        f"   The peak average load time across the campus is **Hour {peak_hour_overall}:00**.\n"
-        f"   *Recommendation: Investigate energy-intensive activities and equipment scheduling during this hour.*\n\n"
-        
-        f"**4. Usage Trends:**\n"
-        f"   Analysis shows {trend_note}\n"
-        f"   Refer to 'dashboard.png' for visualization of daily and weekly trends."
-    )
-    
-    # 3. Save Report
-    with open(OUTPUT_DIR / "summary.txt", "w") as f:
-        f.write(summary_text)
-        
-    print("\n" + summary_text)
-    logging.info("Task 5 complete: Executive summary saved to output/summary.txt")
-
-
-# --- Main Execution Block ---
-
-def main():
-    """Runs the complete energy dashboard pipeline."""
-    logging.info("--- Starting Energy Dashboard Pipeline ---")
-    
-    # 1. Ingestion and Validation
-    df_combined = ingest_and_validate_data()
-    if df_combined is None or df_combined.empty:
-        logging.error("Pipeline aborted: Cannot proceed without valid data.")
-        return
-
-    # 2. Core Aggregation
-    df_daily = calculate_daily_totals(df_combined)
-    df_weekly = calculate_weekly_aggregates(df_combined)
-    df_summary, summary_dict = building_wise_summary(df_combined)
-    
-    # 3. Object-Oriented Modeling
-    manager = BuildingManager()
-    # Note: df_combined is reset when it was cleaned in Task 1, so we must reset index for merging/grouping by 'Building'
-    manager.add_data_from_dataframe(df_combined)
-
-    # 4. Visual Output
-    generate_dashboard_plots(df_daily, df_weekly, df_combined)
-    
-    # 5. Persistence and Executive Summary
-    persist_data(df_combined.reset_index(), df_summary) # Reset index for clean CSV export
-    generate_executive_summary(manager, df_daily, df_summary)
-    
-    logging.info("--- Pipeline Completed Successfully ---")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+# main.py
+#
+# Usage:
+#   python main.py [options]                 run the whole pipeline
+#   python main.py [options] ingest          parse DATA_DIR, export the cleaned data (CSV or Parquet)
+#   python main.py [options] aggregate       write building/daily/weekly/hourly aggregates
+#   python main.py [options] plot            draw dashboard.png from the aggregates
+#   python main.py [options] summarize       write summary.txt from the aggregates
+#   python main.py --shards N aggregate      the same, map-reduced over N worker processes
+#
+# Sharding across machines that share DATA_DIR and a shard folder:
+#   python main.py --shard-dir S shard --index I --num-shards N    on each machine I = 0..N-1
+#   python main.py --shard-dir S reduce --num-shards N             once all shards are written
+#
+# A full run skips every stage whose inputs are unchanged since an earlier run
+# (see StageCache); --no-cache forces everything to be recomputed.
+#
+# The plotting stack (matplotlib/seaborn) is only imported when plotting.
+
+import pandas as pd
+import numpy as np
+import io
+import os
+import shutil
+import sys
+import time
+import argparse
+import json
+import hashlib
+import importlib.util
+import logging
+import pickle
+import warnings
+import cProfile
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from collections.abc import Sequence
+
+try:
+    import resource # Unix only; peak RSS is reported as None elsewhere
+except ImportError:
+    resource = None
+
+# --- 0. Setup and Configuration ---
+# Logging is configured in cli(); importing this module has no side effects
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Define input/output directories (the output directory is created on first write)
+DATA_DIR = Path("data")
+OUTPUT_DIR = Path("output")
+
+# Number of processes used to parse CSV files (1 = read files one after another)
+INGEST_WORKERS = 1
+
+# On-disk cache of cleaned per-file frames, so unchanged CSVs are not re-parsed
+INGEST_CACHE = True
+CACHE_DIR = None # None = OUTPUT_DIR / "ingest_cache"
+
+# On-disk memo of stage results in main(), keyed by the data files, settings and code (LRU, bounded size)
+STAGE_CACHE = True
+STAGE_CACHE_DIR = None # None = OUTPUT_DIR / "stage_cache"
+STAGE_CACHE_MAX_MB = 512
+
+# Rows per chunk for the out-of-core streaming mode (None = load each file whole)
+STREAM_CHUNKSIZE = None
+
+# Seconds between polls of DATA_DIR in live append mode (None = run once)
+LIVE_POLL_SECONDS = None
+
+# Sharded aggregation: split the buildings into this many shards rolled up on a process pool (None = off)
+AGGREGATE_SHARDS = None
+SHARD_DIR = None # shared folder for shard partials in multi-machine mode (None = OUTPUT_DIR / "shards")
+
+# Store the combined frame with a categorical Building column and float32 kWh (restored exactly to float64 for aggregation where the readings allow)
+COMPACT_DTYPES = False
+
+# Format for the cleaned dataset export: 'csv' (one file) or 'parquet' (partitioned by building and month)
+EXPORT_FORMAT = 'csv'
+
+# Dashboard render mode: fast=True downsamples series ('minmax' or 'lttb') and draws panels in parallel
+FAST_DASHBOARD = False
+DASHBOARD_DOWNSAMPLE = 'minmax'
+
+# Per-stage instrumentation: metrics.json next to summary.txt, plus optional cProfile dumps
+COLLECT_METRICS = False
+PROFILE_STAGES = False
+
+def _output_path(file_name):
+    """Returns OUTPUT_DIR / file_name, creating the output directory if needed."""
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    return OUTPUT_DIR / file_name
+
+# --- Instrumentation ---
+
+def _peak_rss_mb(children=False):
+    """
+    Peak resident set size of this process so far, in MB (None if unavailable).
+    With children=True, the largest peak of any finished child process (pool workers).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / 2**20 if os.uname().sysname == "Darwin" else peak / 2**10
+
+def _current_rss_mb():
+    """Current resident set size of this process in MB, from /proc (None if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+def _children_cpu_s():
+    """User + system CPU seconds of all finished child processes (None if unavailable)."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+class PipelineMetrics:
+    """
+    Records wall time, CPU time, memory and rows in/out for each pipeline
+    stage. CPU time of pool workers that finished during the stage is
+    reported separately (children_cpu_s), and memory is reported both as the
+    RSS growth over the stage and as the lifetime peak, since the peak alone
+    cannot show which stage allocated. With profile=True every stage also runs under cProfile and its
+    stats are dumped to <profile_dir>/<stage>.prof. When disabled, stage()
+    adds no measurable overhead.
+    """
+    def __init__(self, enabled=False, profile=False, profile_dir=None):
+        self.enabled = enabled or profile
+        self.profile = profile
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Measures the enclosed block. Yields a dict; set record['rows_out']
+        inside the block to report the stage's output size.
+        """
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+        profiler = cProfile.Profile() if self.profile else None
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        children_start = _children_cpu_s()
+        rss_start = _current_rss_mb()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record['wall_s'] = round(time.perf_counter() - wall_start, 6)
+            record['cpu_s'] = round(time.process_time() - cpu_start, 6)
+            if children_start is not None:
+                record['children_cpu_s'] = round(_children_cpu_s() - children_start, 6)
+            record['rss_start_mb'] = rss_start
+            record['rss_end_mb'] = _current_rss_mb()
+            if rss_start is not None and record['rss_end_mb'] is not None:
+                record['rss_growth_mb'] = record['rss_end_mb'] - rss_start
+            record['peak_rss_mb'] = _peak_rss_mb()
+            record['children_peak_rss_mb'] = _peak_rss_mb(children=True)
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                record['profile'] = str(self.profile_dir / f"{name}.prof")
+                profiler.dump_stats(record['profile'])
+            self.stages.append(record)
+            children_text = f" (+{record['children_cpu_s']:.3f}s in workers)" if record.get('children_cpu_s') else ""
+            memory_text = (
+                f", RSS {record['rss_growth_mb']:+.1f} MB (peak {record['peak_rss_mb']:.1f} MB)"
+                if 'rss_growth_mb' in record and record['peak_rss_mb'] is not None else ""
+            )
+            logging.info(
+                f"[metrics] {name}: {record['wall_s']:.3f}s wall, {record['cpu_s']:.3f}s CPU{children_text}"
+                f"{memory_text}, rows {record['rows_in']} -> {record['rows_out']}"
+            )
+
+    def write(self, path):
+        """Writes the collected stage metrics as JSON."""
+        if not self.enabled:
+            return
+        report = {
+            'total_wall_s': round(sum(s['wall_s'] for s in self.stages), 6),
+            'total_cpu_s': round(sum(s['cpu_s'] for s in self.stages), 6),
+            'total_children_cpu_s': round(sum(s.get('children_cpu_s', 0.0) for s in self.stages), 6),
+            'peak_rss_mb': _peak_rss_mb(),
+            'children_peak_rss_mb': _peak_rss_mb(children=True),
+            'stages': self.stages,
+        }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        logging.info(f"Stage metrics saved to {path}")
+
+# --- Cache Manifests ---
+
+class ManifestCache:
+    """
+    Base for the on-disk caches (IngestCache, StageCache): entries are stored
+    under cache_dir and indexed by manifest.json, which is written atomically.
+    Subclasses say where an entry's data lives by overriding _entry_path.
+    """
+    def __init__(self, cache_dir, label, load=True):
+        self.cache_dir = Path(cache_dir)
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.entries = {}
+        if load and self.manifest_path.exists():
+            try:
+                with open(self.manifest_path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable {label} manifest: {e}")
+
+    def _entry_path(self, key, entry):
+        """File or folder holding the data of one entry."""
+        raise NotImplementedError
+
+    def _remove(self, key):
+        """Drops an entry from the manifest and deletes its data."""
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        path = self._entry_path(key, entry)
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            path.unlink(missing_ok=True)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+# --- Stage Memoization ---
+
+class StageCache(ManifestCache):
+    """
+    Bounded on-disk memo of pipeline stage results. An entry is keyed by a
+    hash of everything the stage depends on and holds the stage's return
+    value (pickled) plus copies of the files it wrote under OUTPUT_DIR, so a
+    hit can skip the stage and put its outputs back. Large outputs that are
+    only ever read in place (the cleaned export) are not copied: the entry
+    records their size and mtime, and a hit requires them to be unchanged in
+    OUTPUT_DIR. manifest.json tracks
+    entry sizes and last use; the least recently used entries are evicted
+    once the cache grows beyond max_bytes.
+    """
+    def __init__(self, cache_dir, max_bytes, enabled=True):
+        super().__init__(cache_dir, "stage cache", load=enabled)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        if sum(entry['size'] for entry in self.entries.values()) > max_bytes:
+            self._evict(keep=None) # the size limit was lowered since the last run
+            self.save()
+
+    @staticmethod
+    def key(stage, *parts):
+        """Hash of the stage name and any JSON-serializable inputs."""
+        token = json.dumps([stage, *parts], sort_keys=True, default=str)
+        return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+    def lookup(self, key):
+        """
+        Restores the files of a cached entry (only those missing or changed in
+        OUTPUT_DIR) and returns (True, value), or (False, None) on a miss.
+        An entry whose in-place files were changed or removed is a miss.
+        """
+        entry = self.entries.get(key) if self.enabled else None
+        if entry is None:
+            return False, None
+        for rel_path, (size, mtime_ns) in entry.get('in_place', {}).items():
+            target = OUTPUT_DIR / rel_path
+            if not target.exists() or (target.stat().st_size, target.stat().st_mtime_ns) != (size, mtime_ns):
+                logging.info(f"Stage cache entry for '{entry['stage']}' is stale: {rel_path} changed")
+                self._remove(key)
+                self.save()
+                return False, None
+        entry_dir = self.cache_dir / key
+        try:
+            for rel_path, (size, mtime_ns) in entry['files'].items():
+                target = OUTPUT_DIR / rel_path
+                if target.exists():
+                    stat = target.stat()
+                    if (stat.st_size, stat.st_mtime_ns) == (size, mtime_ns):
+                        continue
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(entry_dir / "files" / rel_path, target)
+            value = None
+            if entry['has_value']:
+                with open(entry_dir / "value.pkl", "rb") as f:
+                    value = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Dropping unusable stage cache entry for '{entry['stage']}': {e}")
+            self._remove(key)
+            self.save()
+            return False, None
+        entry['last_used'] = time.time()
+        self.save()
+        return True, value
+
+    def store(self, key, stage, value=None, files=(), in_place=()):
+        """
+        Caches a stage's return value and copies of the output files it wrote,
+        then evicts. Files in in_place are only recorded by size and mtime.
+        """
+        if not self.enabled:
+            return
+        self._remove(key)
+        entry_dir = self.cache_dir / key
+        tmp_dir = self.cache_dir / f"{key}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        recorded = {}
+        try:
+            (tmp_dir / "files").mkdir(parents=True)
+            if value is not None:
+                with open(tmp_dir / "value.pkl", "wb") as f:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            for path in files:
+                rel_path = Path(path).relative_to(OUTPUT_DIR)
+                (tmp_dir / "files" / rel_path).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(path, tmp_dir / "files" / rel_path)
+                stat = Path(path).stat()
+                recorded[rel_path.as_posix()] = (stat.st_size, stat.st_mtime_ns)
+            size = sum(p.stat().st_size for p in tmp_dir.rglob("*") if p.is_file())
+            unchanged = {}
+            for path in in_place:
+                stat = Path(path).stat()
+                unchanged[Path(path).relative_to(OUTPUT_DIR).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+            os.replace(tmp_dir, entry_dir)
+        except Exception as e:
+            logging.warning(f"Could not cache stage '{stage}': {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.entries[key] = {
+            'stage': stage, 'size': size, 'last_used': time.time(),
+            'has_value': value is not None, 'files': recorded, 'in_place': unchanged,
+        }
+        self._evict(keep=key)
+        self.save()
+
+    def _evict(self, keep):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        total = sum(entry['size'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda k: self.entries[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep and total - self.entries[key]['size'] > 0:
+                continue
+            total -= self.entries[key]['size']
+            logging.info(f"Evicting stage cache entry for '{self.entries[key]['stage']}'")
+            self._remove(key)
+
+    def _entry_path(self, key, entry):
+        return self.cache_dir / key
+
+def _input_fingerprint():
+    """
+    What every stage of main() depends on: the pipeline code and the name,
+    size and mtime of each data file (stat only, like make, so checking is cheap).
+    """
+    data = []
+    if DATA_DIR.is_dir():
+        for path in sorted(DATA_DIR.glob("*.csv")):
+            stat = path.stat()
+            data.append([path.name, stat.st_size, stat.st_mtime_ns])
+    code = hashlib.blake2b(Path(__file__).read_bytes(), digest_size=16).hexdigest()
+    return {'data_dir': str(DATA_DIR.resolve()), 'data': data, 'code': code, 'compact': COMPACT_DTYPES}
+
+def _tariff_fingerprint():
+    """The tariff settings as a JSON-able value (file contents for a path)."""
+    if TARIFF is None or isinstance(TARIFF, dict):
+        return TARIFF
+    try:
+        return Path(TARIFF).read_text()
+    except OSError:
+        return str(TARIFF)
+
+def stage_cache_keys():
+    """Cache key of each memoized stage of main(): the shared inputs plus the stage's own settings."""
+    inputs = _input_fingerprint()
+    tariff = _tariff_fingerprint()
+    settings = {
+        'aggregate': {'tariff': tariff},
+        'detect_anomalies': {},
+        'plot': {'fast': FAST_DASHBOARD, 'downsample': DASHBOARD_DOWNSAMPLE},
+        'persist': {'tariff': tariff, 'export_format': EXPORT_FORMAT},
+        'summarize': {'tariff': tariff},
+    }
+    return {stage: StageCache.key(stage, inputs, extra) for stage, extra in settings.items()}
+
+# --- Task 1: Data Ingestion and Validation ---
+
+def _building_name_from_file(file_name):
+    """Infers the building name from a filename like 'building_A_month.csv'."""
+    parts = file_name.replace(".csv", "").split("_")
+    return parts[1].upper() if len(parts) > 1 else "UNKNOWN"
+
+def _data_files():
+    """CSV files in DATA_DIR, or None (with an error logged) if there are none."""
+    if not DATA_DIR.is_dir():
+        logging.error(f"Data directory not found at {DATA_DIR}. Please create it and add CSV files.")
+        return None
+    csv_files = list(DATA_DIR.glob("*.csv"))
+    if not csv_files:
+        logging.warning(f"No CSV files found in {DATA_DIR}.")
+        return None
+    return csv_files
+
+# Number of distinct timestamp strings used to sniff the file's format
+TIMESTAMP_SNIFF_SAMPLE = 200
+
+def _to_naive_datetimes(values, fmt):
+    """
+    pd.to_datetime(values, format=fmt, errors='coerce') that always returns
+    naive datetime64[ns]: values with a time zone or offset are converted to
+    UTC and stripped, so a stray '...Z' value cannot turn the column into objects.
+    """
+    parsed = pd.to_datetime(values, format=fmt, errors='coerce', utc=True)
+    return parsed.dt.tz_localize(None).copy() # copy() so the result is not a view of the .dt accessor
+
+def sniff_timestamp_format(values):
+    """
+    Returns the strftime format that parses the most strings in `values` (a
+    small sample), or None if no format fits at least half of them. Corrupt
+    values in the sample are tolerated; they end up on the slow path.
+    """
+    from pandas.tseries.api import guess_datetime_format
+    values = pd.Series([v for v in values if isinstance(v, str)], dtype=object)
+    if values.empty:
+        return None
+    # Guessing is per string and slow, so candidates come from a few values
+    # and are then scored on the whole sample
+    step = max(1, len(values) // 20)
+    with warnings.catch_warnings():
+        # Day-first strings make guess_datetime_format warn per value; the guesses are only candidates
+        warnings.simplefilter('ignore', UserWarning)
+        guesses = pd.Series([guess_datetime_format(v) for v in values.iloc[::step]], dtype=object).dropna()
+    best, best_parsed = None, 0
+    for fmt in guesses.value_counts().index:
+        parsed = _to_naive_datetimes(values, fmt).notna().sum()
+        if parsed > best_parsed:
+            best, best_parsed = fmt, parsed
+    return best if best_parsed * 2 >= len(values) else None
+
+def parse_timestamps(values):
+    """
+    Fast replacement for pd.to_datetime(values, errors='coerce') on raw
+    timestamp strings. Each distinct string is parsed once and the results are
+    mapped back; the bulk is parsed with the format sniffed from a sample
+    spread across the file (so day-first dates are recognised even when the
+    first days are ambiguous), and only values that do not match it go
+    through per-element inference.
+    Returns (datetime Series aligned with values, number of slow-path values).
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values, 0
+    codes, uniques = pd.factorize(values.astype(object))
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=values.index, name=values.name, dtype='datetime64[ns]'), 0
+    
+    sample = uniques[np.linspace(0, len(uniques) - 1, min(len(uniques), TIMESTAMP_SNIFF_SAMPLE), dtype=np.int64)]
+    fmt = sniff_timestamp_format(sample)
+    if fmt is not None:
+        parsed = _to_naive_datetimes(pd.Series(uniques, dtype=object), fmt)
+    else:
+        parsed = pd.Series(pd.NaT, index=range(len(uniques)), dtype='datetime64[ns]')
+    
+    # Slow path: anything the sniffed format could not handle
+    remaining = parsed.index[parsed.isna()]
+    if len(remaining):
+        parsed[remaining] = _to_naive_datetimes(pd.Series(uniques[remaining], dtype=object), 'mixed').to_numpy()
+    
+    result = parsed.to_numpy()[codes]
+    result[codes < 0] = np.datetime64('NaT')
+    return pd.Series(result, index=values.index, name=values.name), len(remaining)
+
+def _prepare_readings(df, building_name):
+    """Renames the core columns, tags the building and drops invalid rows."""
+    if len(df.columns) < 2:
+         raise ValueError("File must contain at least two columns: Timestamp and kwh.")
+         
+    df.rename(columns={df.columns[0]: 'Timestamp', df.columns[1]: 'kwh'}, inplace=True)
+    df['Building'] = building_name
+    
+    df['Timestamp'], slow = parse_timestamps(df['Timestamp'])
+    if slow:
+        logging.info(f"{building_name}: {slow} distinct timestamp value(s) did not match the sniffed format.")
+    df['kwh'] = pd.to_numeric(df['kwh'], errors='coerce')
+    df.dropna(subset=['Timestamp', 'kwh'], inplace=True)
+    return df
+
+def _read_building_file(file_path):
+    """Reads one building CSV, tags its rows with the building name and cleans them."""
+    # 1. Infer metadata from filename (Assumes format like 'building_A_month.csv')
+    building_name = _building_name_from_file(file_path.name)
+    
+    # 2. Read file, skipping bad lines
+    # Assuming the raw files have at least two columns: [Timestamp, kwh]
+    df = pd.read_csv(
+        file_path, 
+        on_bad_lines='skip', # Handles corrupt data by skipping bad lines
+        low_memory=False
+    )
+    
+    # 3. Rename/Assign core columns and clean the rows (invalid timestamps or readings are dropped)
+    return _prepare_readings(df, building_name)
+
+def _load_building_file(file_path):
+    """
+    Wraps _read_building_file so it can run inside a worker process.
+    Returns (DataFrame, None) on success or (None, error message) on failure,
+    so the parent process can log errors exactly as before.
+    """
+    file_name = file_path.name
+    try:
+        return _read_building_file(file_path), None
+    except FileNotFoundError:
+        return None, f"Missing file error: {file_name}"
+    except Exception as e:
+        return None, f"An unexpected error occurred while processing {file_name}: {e}"
+
+def _cleaning_code_version():
+    """Hash of the Task 1 parsing and cleaning code and the pandas version."""
+    import inspect
+    functions = (
+        _building_name_from_file, _to_naive_datetimes, sniff_timestamp_format,
+        parse_timestamps, _prepare_readings, _read_building_file,
+    )
+    token = "".join(inspect.getsource(f) for f in functions) + f"|{TIMESTAMP_SNIFF_SAMPLE}|{pd.__version__}"
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+class IngestCache(ManifestCache):
+    """
+    Parquet cache of cleaned per-file frames stored under CACHE_DIR.
+    Each entry is keyed by the file's path, size, mtime and content hash,
+    and records the version of the cleaning code that produced it; entries
+    from other code versions are misses. The index of entries lives in
+    manifest.json.
+    """
+    def __init__(self, cache_dir):
+        super().__init__(cache_dir, "ingest cache")
+        self.code_version = _cleaning_code_version()
+
+    @staticmethod
+    def fingerprint(file_path):
+        """Returns the (size, mtime, content hash) fingerprint of a file."""
+        stat = file_path.stat()
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+
+    def _key(self, file_path):
+        return str(file_path.resolve())
+
+    def load(self, file_path, fingerprint):
+        """Returns the cached frame for file_path, or None if it is missing or stale."""
+        entry = self.entries.get(self._key(file_path))
+        if entry is None or any(entry.get(k) != v for k, v in fingerprint.items()):
+            return None
+        if entry.get("code") != self.code_version:
+            logging.info(f"Ingest cache entry for {file_path.name} was made by other cleaning code; re-parsing.")
+            return None
+        try:
+            return pd.read_parquet(self.cache_dir / entry["file"])
+        except Exception as e:
+            logging.warning(f"Could not read cache entry for {file_path.name}: {e}")
+            return None
+
+    def store(self, file_path, fingerprint, df):
+        """Writes the cleaned frame for file_path, replacing any older entry."""
+        key = self._key(file_path)
+        self._remove(key)
+        token = f"{key}|{fingerprint['size']}|{fingerprint['mtime_ns']}|{fingerprint['hash']}|{self.code_version}"
+        file_name = hashlib.blake2b(token.encode(), digest_size=16).hexdigest() + ".parquet"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            df.to_parquet(self.cache_dir / file_name, index=False)
+        except Exception as e:
+            logging.warning(f"Could not cache {file_path.name}: {e}")
+            return
+        self.entries[key] = dict(fingerprint, file=file_name, code=self.code_version)
+
+    def evict_missing(self, file_paths):
+        """Drops entries for files that are no longer present in the data directory."""
+        current = {self._key(p) for p in file_paths}
+        for key in [k for k in self.entries if k not in current]:
+            logging.info(f"Evicting cache entry for deleted file: {key}")
+            self._remove(key)
+
+    def _entry_path(self, key, entry):
+        return self.cache_dir / entry["file"]
+
+def ingest_and_validate_data(workers=1, use_cache=False, compact=False):
+    """
+    Reads multiple CSV files, handles errors, and combines them into one clean DataFrame.
+    With workers > 1 the files are parsed on a process pool. Either way the
+    per-file frames are concatenated once at the end.
+    With use_cache, unchanged files are loaded from the ingest cache and only
+    new or modified files are parsed.
+    With compact, the combined frame uses compact dtypes (see compact_energy_frame).
+    """
+    logging.info("Starting Task 1: Data Ingestion and Validation.")
+    df_combined = pd.DataFrame()
+    
+    csv_files = _data_files()
+    if csv_files is None:
+        return None
+    
+    if use_cache and importlib.util.find_spec("pyarrow") is None:
+        logging.warning("pyarrow is not installed; ingest cache disabled.")
+        use_cache = False
+    
+    cache = IngestCache(CACHE_DIR or OUTPUT_DIR / "ingest_cache") if use_cache else None
+    cached = {}
+    fingerprints = {}
+    if cache is not None:
+        cache.evict_missing(csv_files)
+        for file_path in csv_files:
+            fingerprints[file_path] = cache.fingerprint(file_path)
+            df = cache.load(file_path, fingerprints[file_path])
+            if df is not None:
+                cached[file_path] = df
+        logging.info(f"Ingest cache: {len(cached)} unchanged, {len(csv_files) - len(cached)} to parse.")
+    to_parse = [p for p in csv_files if p not in cached]
+    
+    if workers > 1 and len(to_parse) > 1:
+        logging.info(f"Parsing {len(to_parse)} files on {workers} worker processes.")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = dict(zip(to_parse, executor.map(_load_building_file, to_parse)))
+    else:
+        parsed = {p: _load_building_file(p) for p in to_parse}
+    
+    frames = []
+    for file_path in csv_files:
+        if file_path in cached:
+            frames.append(cached[file_path])
+            logging.info(f"Loaded from ingest cache: {file_path.name}")
+            continue
+        df, error = parsed[file_path]
+        if error is not None:
+            logging.error(error)
+            continue
+        frames.append(df)
+        logging.info(f"Successfully ingested and validated: {file_path.name}")
+        if cache is not None:
+            cache.store(file_path, fingerprints[file_path], df)
+    
+    if cache is not None:
+        cache.save()
+    
+    if frames:
+        df_combined = pd.concat(frames, ignore_index=True)
+
+    # 5. Prepare the combined data (each file was already cleaned)
+    if not df_combined.empty:
+        df_combined.set_index('Timestamp', inplace=True)
+        logging.info("Task 1 complete: Data combined and cleaned.")
+        if compact:
+            before = memory_report(df_combined)
+            df_combined = compact_energy_frame(df_combined)
+            log_memory_report(before, memory_report(df_combined))
+        
+    return df_combined
+
+# Largest kWh error accepted when storing readings as float32 (meters report to 0.001 kWh)
+FLOAT32_KWH_TOLERANCE = 5e-4
+# Most decimals a kWh reading may have for float32 storage to be restored exactly
+MAX_KWH_DECIMALS = 6
+
+def _kwh_decimals(kwh, max_decimals=MAX_KWH_DECIMALS):
+    """Fewest decimals (up to max_decimals) that every reading is written with, or None."""
+    finite = kwh[np.isfinite(kwh)]
+    for decimals in range(max_decimals + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return decimals
+    return None
+
+def compact_energy_frame(df, tolerance=FLOAT32_KWH_TOLERANCE):
+    """
+    Returns the combined frame with a categorical 'Building' column and, where
+    possible, float32 kWh. When every reading has at most MAX_KWH_DECIMALS
+    decimals and rounding the float32 value back to that many decimals gives
+    the original reading, the decimals are kept in df.attrs['kwh_decimals']
+    and kwh_values() restores the exact float64 readings, so every aggregate
+    matches the full-precision run. Otherwise float32 is used only if every
+    reading survives the round trip within `tolerance` kWh, and aggregates
+    may then differ by that much per reading.
+    """
+    df = df.copy()
+    df['Building'] = df['Building'].astype('category')
+    
+    kwh = df['kwh'].to_numpy(dtype=np.float64)
+    with np.errstate(over='ignore'):
+        downcast = kwh.astype(np.float32)
+    if len(kwh) and not (np.isfinite(downcast) == np.isfinite(kwh)).all():
+        logging.warning("Compact dtypes: kWh values overflow float32; keeping float64.")
+        return df
+    decimals = _kwh_decimals(kwh)
+    if decimals is not None and np.array_equal(
+        np.round(downcast.astype(np.float64), decimals), kwh, equal_nan=True
+    ):
+        df['kwh'] = downcast
+        df.attrs['kwh_decimals'] = decimals
+        return df
+    error = np.abs(downcast.astype(np.float64) - kwh)
+    if len(kwh) and np.nanmax(error) > tolerance:
+        logging.warning(
+            f"Compact dtypes: float32 would change kWh by up to {np.nanmax(error):.2g}; keeping float64."
+        )
+    else:
+        logging.info(f"Compact dtypes: float32 kWh is not exact; aggregates may differ by up to {tolerance} kWh per reading.")
+        df['kwh'] = downcast
+    return df
+
+def kwh_values(df):
+    """kWh as a float64 array, restoring the exact readings of a compact frame (see compact_energy_frame)."""
+    kwh = df['kwh'].to_numpy(dtype=np.float64)
+    decimals = df.attrs.get('kwh_decimals')
+    if decimals is not None and df['kwh'].dtype == np.float32:
+        kwh = np.round(kwh, decimals)
+    return kwh
+
+def _float64_kwh(df):
+    """The frame itself if kWh is float64, otherwise a copy with the kWh restored by kwh_values."""
+    if df['kwh'].dtype == np.float64:
+        return df
+    return df.assign(kwh=kwh_values(df))
+
+def memory_report(df):
+    """Returns {column: bytes} for the frame, including its index and string contents."""
+    usage = df.memory_usage(deep=True)
+    report = {('index' if name == 'Index' else name): int(size) for name, size in usage.items()}
+    report['total'] = int(usage.sum())
+    return report
+
+def log_memory_report(before, after):
+    """Logs the per-column memory of the combined frame before and after compaction."""
+    lines = [f"{'column':<12}{'before MB':>12}{'after MB':>12}"]
+    for name in before:
+        lines.append(f"{name:<12}{before[name] / 2**20:>12.2f}{after.get(name, 0) / 2**20:>12.2f}")
+    logging.info("Memory report (combined frame):\n" + "\n".join(lines))
+
+# --- Task 2: Core Aggregation Logic ---
+
+def calculate_daily_totals(df):
+    """Calculates total daily consumption per building."""
+    logging.info("Calculating daily totals.")
+    df = _float64_kwh(df) # Sum compact (float32) readings in full precision
+    # Group by Building, then resample the Timestamp index to daily ('D') frequency and sum the kwh
+    df_daily = df.groupby('Building', observed=True)['kwh'].resample('D').sum().reset_index()
+    df_daily.rename(columns={'kwh': 'Daily_kwh_Total'}, inplace=True)
+    return df_daily
+
+def calculate_weekly_aggregates(df):
+    """Calculates total weekly consumption per building."""
+    logging.info("Calculating weekly totals.")
+    df = _float64_kwh(df)
+    # Group by Building, then resample the Timestamp index to weekly ('W') frequency and sum the kwh
+    df_weekly = df.groupby('Building', observed=True)['kwh'].resample('W').sum().reset_index()
+    df_weekly.rename(columns={'kwh': 'Weekly_kwh_Total'}, inplace=True)
+    return df_weekly
+
+def building_wise_summary(df):
+    """Calculates mean, min, max, total consumption and the standard deviation of readings for each building."""
+    logging.info("Calculating building-wise summary.")
+    df = _float64_kwh(df)
+    building_summary_df = df.groupby('Building', observed=True)['kwh'].agg(
+        Mean_kwh='mean',
+        Min_kwh='min',
+        Max_kwh='max',
+        Total_kwh='sum',
+        Std_kwh='std'
+    ).reset_index()
+    
+    # Store results in a dictionary (as per requirement)
+    summary_dict = building_summary_df.set_index('Building').T.to_dict('dict')
+    
+    return building_summary_df, summary_dict
+
+# --- Task 2b: Rollup Engine and Out-of-Core Streaming Aggregation ---
+
+class LoadSketch:
+    """
+    Mergeable streaming quantile sketch (DDSketch) of the individual readings
+    per building and hour of day. Each reading is counted in a logarithmic
+    bucket, so every reported quantile is within RELATIVE_ACCURACY (1%) of the
+    exact reading at that rank; readings smaller than MIN_KWH in magnitude are
+    reported as 0. Memory does not grow with the number of readings: there
+    are at most log(max kWh / MIN_KWH) / log(gamma) buckets per building and
+    hour, about 700 for readings between 0.001 and 1,000 kWh.
+    """
+    RELATIVE_ACCURACY = 0.01
+    MIN_KWH = 1e-3
+    QUANTILES = {'P50_kwh': 0.50, 'P95_kwh': 0.95, 'P99_kwh': 0.99}
+    CONSOLIDATE_EVERY = 32
+
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    # Bucket keys are sign * (log-bucket index - _OFFSET), so key 0 holds the
+    # near-zero readings and sorting keys sorts the buckets by value
+    _OFFSET = int(np.ceil(np.log(MIN_KWH) / np.log(GAMMA))) - 1
+
+    def __init__(self):
+        self._parts = []
+
+    @classmethod
+    def bucket_keys(cls, kwh):
+        magnitude = np.abs(kwh)
+        keys = np.zeros(len(kwh), dtype=np.int64)
+        large = magnitude > cls.MIN_KWH
+        keys[large] = np.ceil(np.log(magnitude[large]) / np.log(cls.GAMMA)).astype(np.int64) - cls._OFFSET
+        return keys * np.sign(kwh).astype(np.int64)
+
+    @classmethod
+    def bucket_values(cls, keys):
+        """Representative value of each bucket (within RELATIVE_ACCURACY of everything in it)."""
+        magnitude = 2 * cls.GAMMA ** (np.abs(keys) + cls._OFFSET).astype(np.float64) / (cls.GAMMA + 1)
+        return np.where(keys == 0, 0.0, np.sign(keys) * magnitude)
+
+    def update(self, buildings, timestamps, kwh):
+        """Adds readings given as arrays of building names, datetime64 timestamps and kWh."""
+        if len(kwh) == 0:
+            return
+        hours = timestamps.astype('datetime64[h]').astype(np.int64) % 24
+        part = pd.DataFrame({
+            'Building': buildings, 'Hour': hours, 'Bucket': self.bucket_keys(kwh),
+        }).groupby(['Building', 'Hour', 'Bucket'], sort=False).size()
+        self._parts.append(part)
+        if len(self._parts) >= self.CONSOLIDATE_EVERY:
+            self._consolidate()
+
+    def merge(self, other):
+        self._parts.extend(other._parts)
+        self._consolidate()
+
+    def _consolidate(self):
+        if len(self._parts) > 1:
+            self._parts = [pd.concat(self._parts).groupby(level=[0, 1, 2], sort=False).sum()]
+
+    @property
+    def is_empty(self):
+        return not self._parts
+
+    @property
+    def table(self):
+        """Reading counts indexed by (Building, Hour, Bucket)."""
+        self._consolidate()
+        return self._parts[0].rename('count')
+
+    @classmethod
+    def from_table(cls, table):
+        sketch = cls()
+        if not table.empty:
+            sketch._parts.append(table)
+        return sketch
+
+    def quantiles(self, by=('Building',)):
+        """P50/P95/P99 of the readings for each group of `by` (index levels of table)."""
+        counts = self.table.groupby(level=list(by) + ['Bucket']).sum()
+        keys = counts.index.get_level_values('Bucket').to_numpy()
+        groups = counts.index.droplevel('Bucket')
+        codes, uniques = pd.factorize(groups)
+        cumulative = np.cumsum(counts.to_numpy())
+        totals = np.bincount(codes, weights=counts.to_numpy())
+        group_start = np.concatenate(([0], np.cumsum(totals)[:-1]))
+        
+        result = pd.DataFrame(index=pd.Index(uniques) if len(by) == 1 else pd.MultiIndex.from_tuples(uniques))
+        result.index.names = list(by)
+        for column, q in self.QUANTILES.items():
+            # First bucket whose cumulative count passes rank q * (n - 1)
+            rank = group_start + np.floor(q * (totals - 1))
+            positions = np.searchsorted(cumulative, rank, side='right')
+            result[column] = self.bucket_values(keys[positions])
+        return result
+
+class EnergyRollup:
+    """
+    Single-pass rollup engine. The raw readings are scanned once into a small
+    per-building hourly base table of mergeable stats (count, sum, min, max
+    and m2, the sum of squared deviations from the mean); daily, weekly, whole-period and hour-of-day
+    views are all derived from that table. Rollups can be fed chunk by chunk
+    (streaming mode) and merged, so the full cleaned frame never has to exist
+    in memory. Reading-level percentiles come from a LoadSketch fed in the
+    same pass.
+    """
+    # Pending partials are combined once this many chunks have been added
+    CONSOLIDATE_EVERY = 32
+    STAT_COLUMNS = ['count', 'sum', 'min', 'max', 'm2']
+
+    def __init__(self):
+        self._parts = []
+        self.sketch = LoadSketch()
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Builds a rollup from the Task 1 DataFrame in one scan."""
+        rollup = cls()
+        rollup.update(df)
+        return rollup
+
+    @classmethod
+    def from_base_table(cls, table, sketch_table=None):
+        """Rebuilds a rollup from a stored base table (see base_table) and optional sketch table."""
+        rollup = cls()
+        if not table.empty:
+            rollup._parts.append(table[cls.STAT_COLUMNS])
+        if sketch_table is not None:
+            rollup.sketch = LoadSketch.from_table(sketch_table)
+        return rollup
+
+    def update(self, df):
+        """Adds a cleaned chunk with a 'Timestamp' column (or index), 'Building' and 'kwh'."""
+        if 'Timestamp' not in df.columns:
+            df = df.reset_index()
+        if df.empty:
+            return
+        kwh = kwh_values(df)
+        buildings = df['Building'].to_numpy()
+        timestamps = df['Timestamp'].to_numpy()
+        readings = pd.DataFrame({
+            'Building': buildings,
+            'Timestamp': timestamps.astype('datetime64[h]').astype('datetime64[ns]'),
+            'kwh': kwh,
+        })
+        self.sketch.update(buildings, timestamps, kwh)
+        grouped = readings.groupby(['Building', 'Timestamp'], sort=False)
+        part = grouped['kwh'].agg(['count', 'sum', 'min', 'max'])
+        part['m2'] = grouped['kwh'].var(ddof=0) * part['count']
+        self._parts.append(part)
+        if len(self._parts) >= self.CONSOLIDATE_EVERY:
+            self._consolidate()
+
+    def merge(self, other):
+        """Folds another rollup's partials into this one."""
+        self._parts.extend(other._parts)
+        self._consolidate()
+        self.sketch.merge(other.sketch)
+
+    def _consolidate(self):
+        if len(self._parts) > 1:
+            self._parts = [self._combine(pd.concat(self._parts), [0, 1])]
+
+    @staticmethod
+    def _combine(stats, level):
+        """
+        Merges the stats rows that share the given index level(s). m2 is merged
+        with the parallel variance formula (Chan et al.): the parts' m2 plus each
+        part's count times its squared distance from the merged mean, which
+        avoids the cancellation of sum of squares minus squared sum.
+        """
+        grouped = stats.groupby(level=level, sort=False)
+        merged = grouped.agg({'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'm2': 'sum'})
+        merged_mean = grouped['sum'].transform('sum') / grouped['count'].transform('sum')
+        spread = stats['count'] * (stats['sum'] / stats['count'] - merged_mean) ** 2
+        merged['m2'] += spread.groupby(level=level, sort=False).sum()
+        return merged
+
+    @property
+    def is_empty(self):
+        return not self._parts
+
+    @property
+    def base_table(self):
+        """The per-building hourly stats, indexed by (Building, Timestamp)."""
+        self._consolidate()
+        return self._parts[0].sort_index()
+
+    # --- Derived views ---
+
+    def hourly_totals(self):
+        """
+        Hourly kWh per building with empty hours filled with 0 (like resample('H').sum()),
+        plus the number of readings in each hour ('count').
+        """
+        return self._resample_sum('h', 'kwh', with_count=True)
+
+    def daily_totals(self):
+        """Same output as calculate_daily_totals."""
+        return self._resample_sum('D', 'Daily_kwh_Total')
+
+    def weekly_totals(self):
+        """Same output as calculate_weekly_aggregates."""
+        return self._resample_sum('W', 'Weekly_kwh_Total')
+
+    def building_stats(self):
+        """Whole-period count, mean, std, min, max and sum per building."""
+        totals = self._combine(self.base_table, 'Building').sort_index()
+        n = totals['count']
+        return pd.DataFrame({
+            'count': n,
+            'mean': totals['sum'] / n,
+            'std': np.sqrt(totals['m2'] / (n - 1)).where(n > 1),
+            'min': totals['min'],
+            'max': totals['max'],
+            'sum': totals['sum'],
+        })
+
+    def building_summary(self, tariff=None):
+        """
+        Same outputs as building_wise_summary: (summary DataFrame, summary dict).
+        With a TariffSchedule, Total_cost and Avg_rate columns are added.
+        """
+        stats = self.building_stats()
+        building_summary_df = pd.DataFrame({
+            'Mean_kwh': stats['mean'],
+            'Min_kwh': stats['min'],
+            'Max_kwh': stats['max'],
+            'Total_kwh': stats['sum'],
+            'Std_kwh': stats['std'],
+        })
+        if not self.sketch.is_empty:
+            building_summary_df = building_summary_df.join(self.sketch.quantiles(('Building',)))
+        if tariff is not None:
+            building_summary_df['Total_cost'] = self.building_costs(tariff)
+            building_summary_df['Avg_rate'] = building_summary_df['Total_cost'] / building_summary_df['Total_kwh']
+        building_summary_df = building_summary_df.reset_index()
+        summary_dict = building_summary_df.set_index('Building').T.to_dict('dict')
+        return building_summary_df, summary_dict
+
+    def building_costs(self, tariff):
+        """
+        Cost per building under a TariffSchedule. Rates only change on the hour,
+        so pricing the hourly kWh sums gives the same result as pricing every
+        reading, in one vectorized pass over the (much smaller) base table.
+        """
+        base = self.base_table
+        timestamps = base.index.get_level_values('Timestamp').to_numpy()
+        cost = base['sum'].to_numpy() * tariff.rates_for(timestamps)
+        return pd.Series(cost, index=base.index).groupby(level='Building').sum()
+
+    def hour_of_day_profile(self):
+        """
+        Average hourly kWh per building for each hour of the day (0-23), with
+        empty hours counted as 0 like the gap-filled hourly totals. Computed
+        from the base table: kWh per slot over the number of hours of that
+        slot in the building's span, without expanding the hourly series.
+        """
+        sums = self.base_table['sum']
+        hours = sums.index.get_level_values('Timestamp').to_numpy().astype('datetime64[h]').astype(np.int64)
+        frame = pd.DataFrame({'Building': sums.index.get_level_values('Building'), 'hour': hours, 'kwh': sums.to_numpy()})
+        span = frame.groupby('Building')['hour'].agg(['min', 'max'])
+        kwh_per_slot = frame.groupby(['Building', frame['hour'] % 24])['kwh'].sum().unstack(fill_value=0.0)
+        kwh_per_slot = kwh_per_slot.reindex(index=span.index, columns=range(24), fill_value=0.0)
+        first = span['min'].to_numpy()[:, None]
+        n_hours = (span['max'] - span['min'] + 1).to_numpy()[:, None]
+        hours_per_slot = n_hours // 24 + ((np.arange(24) - first) % 24 < n_hours % 24)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            profile = pd.DataFrame(kwh_per_slot.to_numpy() / hours_per_slot, index=span.index, columns=range(24))
+        profile.columns.name = 'Hour'
+        profile = profile.stack().rename('kwh').reset_index()
+        return profile[profile['kwh'].notna()].reset_index(drop=True)
+
+    def hour_of_day_percentiles(self):
+        """Reading-level P50/P95/P99 per building and hour of the day (0-23), from the sketch."""
+        if self.sketch.is_empty:
+            return pd.DataFrame(columns=['Building', 'Hour', *LoadSketch.QUANTILES])
+        return self.sketch.quantiles(('Building', 'Hour')).reset_index()
+
+    def peak_hour(self):
+        """Hour of the day (0-23) with the highest average campus-wide hourly load."""
+        return _peak_hour_of_day(self.base_table['sum'].groupby(level='Timestamp').sum())
+
+    def _resample_sum(self, freq, column, with_count=False):
+        columns = ['sum', 'count'] if with_count else ['sum']
+        frame = self.base_table[columns].rename(columns={'sum': 'kwh'}).reset_index(level='Building')
+        result = frame.groupby('Building')[['kwh', 'count'] if with_count else 'kwh'].resample(freq).sum().reset_index()
+        return result.rename(columns={'kwh': column})
+
+def stream_and_aggregate_data(chunksize, cleaned_csv_path=None):
+    """
+    Out-of-core alternative to ingest_and_validate_data + the Task 2 functions.
+    Each CSV is read in chunks of `chunksize` rows; every cleaned chunk is folded
+    into an EnergyRollup and, if cleaned_csv_path is given, appended to that CSV.
+    Returns the rollup, or None if no valid data was found.
+    """
+    logging.info(f"Starting Task 1 (streaming): reading files in chunks of {chunksize:,} rows.")
+    csv_files = _data_files()
+    if csv_files is None:
+        return None
+    
+    rollup = EnergyRollup()
+    export = open(cleaned_csv_path, "w", newline="") if cleaned_csv_path is not None else None
+    rows_written = 0
+    try:
+        for file_path in csv_files:
+            file_name = file_path.name
+            building_name = _building_name_from_file(file_name)
+            # A file that fails part-way is dropped entirely, as in batch mode,
+            # so remember where its rows start in the export
+            file_rollup = EnergyRollup()
+            file_rows = 0
+            export_offset = export.tell() if export is not None else 0
+            try:
+                for chunk in pd.read_csv(file_path, on_bad_lines='skip', chunksize=chunksize):
+                    chunk = _prepare_readings(chunk, building_name)
+                    file_rollup.update(chunk)
+                    if export is not None and not chunk.empty:
+                        chunk = chunk[['Timestamp', 'kwh', 'Building']]
+                        # Number rows like persist_data's reset index
+                        start = rows_written + file_rows
+                        chunk.index = pd.RangeIndex(start, start + len(chunk))
+                        chunk.to_csv(export, header=(start == 0))
+                    file_rows += len(chunk)
+            except Exception as e:
+                if isinstance(e, FileNotFoundError):
+                    logging.error(f"Missing file error: {file_name}")
+                else:
+                    logging.error(f"An unexpected error occurred while processing {file_name}: {e}")
+                if export is not None:
+                    export.seek(export_offset)
+                    export.truncate()
+                continue
+            rows_written += file_rows
+            rollup.merge(file_rollup)
+            logging.info(f"Successfully ingested and validated: {file_name}")
+    finally:
+        if export is not None:
+            export.close()
+    
+    if rollup.is_empty:
+        return None
+    logging.info("Task 1 complete (streaming): partial aggregates built.")
+    return rollup
+
+# --- Task 2c: Sharded Map-Reduce Aggregation ---
+
+def shard_of(building_name, num_shards):
+    """Stable shard number for a building: the same on every machine and every run."""
+    digest = hashlib.blake2b(str(building_name).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % num_shards
+
+def shard_files(csv_files, shard_index, num_shards):
+    """The CSV files whose building belongs to shard `shard_index`."""
+    return sorted(
+        p for p in csv_files
+        if shard_of(_building_name_from_file(p.name), num_shards) == shard_index
+    )
+
+def _rollup_files(file_paths):
+    """
+    Map step: ingests the given files into one EnergyRollup. Runs inside worker
+    processes, so it returns (rollup, log messages) for the parent to log.
+    """
+    rollup = EnergyRollup()
+    messages = []
+    for file_path in file_paths:
+        df, error = _load_building_file(file_path)
+        if error is not None:
+            messages.append((logging.ERROR, error))
+            continue
+        rollup.update(df)
+        messages.append((logging.INFO, f"Successfully ingested and validated: {file_path.name}"))
+    return rollup, messages
+
+def sharded_aggregate(num_shards, workers=None):
+    """
+    Map-reduce alternative to ingest_and_validate_data + EnergyRollup: the
+    buildings are split into num_shards shards, each shard is ingested and
+    rolled up on its own worker process, and only the small partial stats
+    (count, sum, min, max, sum of squares per building and hour) are sent back
+    and merged. Returns the merged rollup, or None if no valid data was found.
+    """
+    csv_files = _data_files()
+    if csv_files is None:
+        return None
+    shards = [shard_files(csv_files, i, num_shards) for i in range(num_shards)]
+    workers = min(workers or os.cpu_count() or 1, num_shards)
+    logging.info(f"Aggregating {len(csv_files)} files in {num_shards} shards on {workers} worker process(es).")
+    
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_rollup_files, shards))
+    else:
+        results = [_rollup_files(files) for files in shards]
+    
+    # Reduce step
+    rollup = EnergyRollup()
+    for partial, messages in results:
+        for level, message in messages:
+            logging.log(level, message)
+        rollup.merge(partial)
+    return None if rollup.is_empty else rollup
+
+def _shard_path(shard_dir, shard_index, num_shards, kind="stats"):
+    return Path(shard_dir) / f"shard-{shard_index:04d}-of-{num_shards:04d}-{kind}.parquet"
+
+def write_shard(shard_index, num_shards, shard_dir):
+    """
+    Map step for multi-machine runs: rolls up this shard's buildings and
+    stores the partial stats in shard_dir (a folder shared by all machines).
+    """
+    if importlib.util.find_spec("pyarrow") is None:
+        logging.error("pyarrow is required to store shard partials.")
+        return None
+    csv_files = _data_files()
+    if csv_files is None:
+        return None
+    files = shard_files(csv_files, shard_index, num_shards)
+    rollup, messages = _rollup_files(files)
+    for level, message in messages:
+        logging.log(level, message)
+    
+    table = rollup.base_table if not rollup.is_empty else pd.DataFrame(
+        columns=EnergyRollup.STAT_COLUMNS,
+        index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=['Building', 'Timestamp']),
+    )
+    sketch = rollup.sketch.table if not rollup.sketch.is_empty else pd.Series(
+        [], dtype=np.int64, name='count',
+        index=pd.MultiIndex.from_arrays([[], [], []], names=['Building', 'Hour', 'Bucket']),
+    )
+    path = _shard_path(shard_dir, shard_index, num_shards)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write under temporary names so the reducer never sees a half-written shard;
+    # the stats file is renamed last and marks the shard as complete
+    for kind, frame in (("sketch", sketch.reset_index()), ("stats", table.reset_index())):
+        final_path = _shard_path(shard_dir, shard_index, num_shards, kind)
+        partial_path = final_path.with_suffix(".tmp")
+        frame.to_parquet(partial_path, index=False)
+        os.replace(partial_path, final_path)
+    logging.info(f"Shard {shard_index + 1}/{num_shards}: {len(files)} files, {len(table)} partial rows -> {path}")
+    return path
+
+def reduce_shards(shard_dir, num_shards):
+    """
+    Reduce step for multi-machine runs: merges the num_shards partials written
+    by write_shard. Returns the merged rollup, or None if a shard is missing
+    or there is no data.
+    """
+    paths = [_shard_path(shard_dir, i, num_shards) for i in range(num_shards)]
+    missing = [p.name for p in paths if not p.exists()]
+    if missing:
+        logging.error(f"Missing shard partials in {shard_dir}: {', '.join(missing)}")
+        return None
+    rollup = EnergyRollup()
+    for path in paths:
+        table = pd.read_parquet(path)
+        table['Building'] = table['Building'].astype(object)
+        sketch = pd.read_parquet(path.with_name(path.name.replace("-stats.", "-sketch.")))
+        sketch['Building'] = sketch['Building'].astype(object)
+        rollup.merge(EnergyRollup.from_base_table(
+            table.set_index(['Building', 'Timestamp']),
+            sketch.set_index(['Building', 'Hour', 'Bucket'])['count'],
+        ))
+    return None if rollup.is_empty else rollup
+
+# --- Task 2d: Time-of-Use Costs ---
+
+# Tariff used for building costs: None (no costs), a dict like EXAMPLE_TARIFF,
+# or the path of a JSON file with the same structure
+TARIFF = None
+
+# Bands are checked in order and the first match wins; unmatched hours use default_rate.
+# "hours" is [start, end) in hours of the day and may wrap past midnight, e.g. [22, 6].
+EXAMPLE_TARIFF = {
+    'currency': '$',
+    'default_rate': 0.10,
+    'bands': [
+        {'name': 'summer peak', 'months': [6, 7, 8, 9], 'days': 'weekday', 'hours': [14, 20], 'rate': 0.32},
+        {'name': 'peak', 'days': 'weekday', 'hours': [8, 20], 'rate': 0.22},
+        {'name': 'shoulder', 'days': 'all', 'hours': [7, 22], 'rate': 0.15},
+    ],
+}
+
+def _weekday_from_epoch_days(days):
+    """Weekday (Monday = 0) of day numbers counted from 1970-01-01; works on ints and arrays."""
+    # 1970-01-01 was a Thursday
+    return (days + 3) % 7
+
+class TariffSchedule:
+    """
+    A time-of-use tariff compiled into a rate lookup table indexed by
+    [month - 1, is_weekend, hour], so pricing any number of readings is a
+    single array lookup instead of a per-row rule check.
+    """
+    DAYS = {'weekday': [0], 'weekend': [1], 'all': [0, 1]}
+
+    def __init__(self, bands, default_rate, currency='$'):
+        self.currency = currency
+        self.rates = np.full((12, 2, 24), float(default_rate))
+        # Apply the bands last to first so that earlier bands take precedence
+        for band in reversed(bands):
+            months = np.asarray(band.get('months', range(1, 13))) - 1
+            days = self.DAYS.get(band.get('days', 'all'))
+            start, end = band.get('hours', [0, 24])
+            if days is None:
+                raise ValueError(f"Tariff band {band.get('name')!r}: days must be weekday, weekend or all.")
+            if not (0 <= start <= 24 and 0 <= end <= 24) or months.min() < 0 or months.max() > 11:
+                raise ValueError(f"Tariff band {band.get('name')!r}: hours must be in 0-24 and months in 1-12.")
+            hours = np.arange(24)
+            in_band = (hours >= start) & (hours < end) if start <= end else (hours >= start) | (hours < end)
+            for day in days:
+                self.rates[np.ix_(months, [day], hours[in_band])] = float(band['rate'])
+
+    @classmethod
+    def from_config(cls, config):
+        """Builds a schedule from a dict like EXAMPLE_TARIFF or a path to a JSON file."""
+        if isinstance(config, (str, Path)):
+            config = json.loads(Path(config).read_text())
+        return cls(config.get('bands', []), config['default_rate'], config.get('currency', '$'))
+
+    def rates_for(self, timestamps):
+        """Rate per kWh for each datetime64 timestamp."""
+        timestamps = np.asarray(timestamps, dtype='datetime64[ns]')
+        hours = timestamps.astype('datetime64[h]').astype(np.int64)
+        month = timestamps.astype('datetime64[M]').astype(np.int64) % 12
+        weekend = (_weekday_from_epoch_days(hours // 24) >= 5).astype(np.int64)
+        return self.rates[month, weekend, hours % 24]
+
+    def costs(self, timestamps, kwh):
+        """Cost of each reading."""
+        return np.asarray(kwh, dtype=np.float64) * self.rates_for(timestamps)
+
+def active_tariff():
+    """The configured TariffSchedule, or None when costs are disabled."""
+    return TariffSchedule.from_config(TARIFF) if TARIFF is not None else None
+
+# --- Task 2e: Anomaly Detection ---
+
+ANOMALIES_FILE = "anomalies.csv"
+
+class HourlyAnomalyDetector:
+    """
+    Flags spikes and drops (e.g. outages) in hourly per-building load.
+    Hours are scored as kWh per reading when the table has a 'count' column,
+    so an hour that lost a reading to a corrupt line is not mistaken for a
+    drop; hours without readings are skipped (missing data, not zero load).
+    Each building keeps one robust baseline per hour of the day, separately
+    for weekdays and weekends (48 slots): an
+    exponentially weighted mean and scale updated with Huber-clipped
+    residuals, so a single bad hour barely moves it. Each hourly value costs
+    O(1) and the state is tiny, so the detector can run once over the whole
+    history (batch) or be fed new hours as they arrive (incremental).
+    """
+    SLOTS = 48           # hour of the day x weekday/weekend
+    ALPHA = 0.05         # weight of the newest observation (about the last 20 observations per slot)
+    HUBER_K = 3.0        # residuals are clipped at HUBER_K * scale before updating
+    THRESHOLD = 5.0      # flag hours more than THRESHOLD robust scales from the baseline
+    WARMUP = 14          # observations per slot before anything is flagged
+    MIN_SCALE = 0.05     # scale floor as a fraction of the baseline (plus 0.001 kWh)
+
+    def __init__(self):
+        self.buildings = {} # name -> row in the state arrays
+        self._mean = np.zeros((0, self.SLOTS))
+        self._scale = np.zeros((0, self.SLOTS))
+        self._count = np.zeros((0, self.SLOTS), dtype=np.int64)
+        self._last_hour = np.zeros(0, dtype=np.int64) # per building: newest processed hour (hours since epoch)
+        self._anomalies = []
+
+    def _rows_for(self, names):
+        for name in pd.unique(names):
+            if name not in self.buildings:
+                self.buildings[name] = len(self.buildings)
+        grow = len(self.buildings) - len(self._mean)
+        if grow > 0:
+            self._mean = np.vstack([self._mean, np.zeros((grow, self.SLOTS))])
+            self._scale = np.vstack([self._scale, np.zeros((grow, self.SLOTS))])
+            self._count = np.vstack([self._count, np.zeros((grow, self.SLOTS), dtype=np.int64)])
+            self._last_hour = np.concatenate([self._last_hour, np.full(grow, np.iinfo(np.int64).min)])
+        return pd.Series(self.buildings)[names].to_numpy()
+
+    def update(self, df_hourly):
+        """
+        Processes the rows of an hourly table (Building, Timestamp, kwh and
+        optionally count) that are newer than anything already seen for their building. Pass only
+        complete hours: an hour that is still filling up would be scored as is
+        and then skipped when its remaining readings arrive. Returns the newly
+        flagged hours.
+        """
+        if df_hourly.empty:
+            return self._empty_frame()
+        hours = df_hourly['Timestamp'].to_numpy().astype('datetime64[h]').astype(np.int64)
+        rows = self._rows_for(df_hourly['Building'].to_numpy())
+        if 'count' in df_hourly.columns:
+            readings = df_hourly['count'].to_numpy(dtype=np.float64)
+        else:
+            readings = np.ones(len(hours))
+        keep = (hours > self._last_hour[rows]) & (readings > 0)
+        if not keep.any():
+            return self._empty_frame()
+        names = df_hourly['Building'].to_numpy()[keep]
+        hours = hours[keep]
+        rows = rows[keep]
+        kwh = df_hourly['kwh'].to_numpy(dtype=np.float64)[keep]
+        readings = readings[keep]
+        rate = kwh / readings # kWh per reading, so partial coverage does not look like a drop
+        
+        # Walk the hours in time order; all buildings sharing an hour are updated together
+        order = np.lexsort((rows, hours))
+        hours, rows, kwh, names = hours[order], rows[order], kwh[order], names[order]
+        rate, readings = rate[order], readings[order]
+        bounds = np.flatnonzero(np.diff(hours)) + 1
+        flagged, expected, scores = [], [], []
+        for block in np.split(np.arange(len(hours)), bounds):
+            hour = hours[block[0]]
+            slot = hour % 24 + (24 if _weekday_from_epoch_days(hour // 24) >= 5 else 0)
+            r = rows[block]
+            x = rate[block]
+            mean = self._mean[r, slot]
+            count = self._count[r, slot]
+            scale = np.maximum(self._scale[r, slot], self.MIN_SCALE * np.abs(mean) + 1e-3)
+            z = (x - mean) / scale
+            
+            hit = (count >= self.WARMUP) & (np.abs(z) > self.THRESHOLD)
+            if hit.any():
+                flagged.append(block[hit])
+                expected.append(mean[hit] * readings[block][hit])
+                scores.append(z[hit])
+            
+            # Huber update; the first observations use a larger step to start quickly
+            alpha = np.maximum(self.ALPHA, 1.0 / (count + 1))
+            residual = np.clip(x - mean, -self.HUBER_K * scale, self.HUBER_K * scale)
+            first = count == 0
+            self._mean[r, slot] = np.where(first, x, mean + alpha * residual)
+            self._scale[r, slot] = np.where(
+                first, 0.0, np.sqrt((1 - alpha) * self._scale[r, slot] ** 2 + alpha * residual ** 2)
+            )
+            self._count[r, slot] = count + 1
+        np.maximum.at(self._last_hour, rows, hours)
+        
+        if not flagged:
+            return self._empty_frame()
+        idx = np.concatenate(flagged)
+        score = np.concatenate(scores)
+        found = pd.DataFrame({
+            'Building': names[idx],
+            'Timestamp': hours[idx].astype('datetime64[h]').astype('datetime64[ns]'),
+            'kwh': kwh[idx],
+            'expected_kwh': np.concatenate(expected),
+            'score': score,
+            'kind': np.where(score > 0, 'spike', 'drop'),
+        })
+        self._anomalies.append(found)
+        return found
+
+    @staticmethod
+    def _empty_frame():
+        return pd.DataFrame(columns=['Building', 'Timestamp', 'kwh', 'expected_kwh', 'score', 'kind'])
+
+    @property
+    def anomalies(self):
+        """Every hour flagged so far, sorted by building and time."""
+        if not self._anomalies:
+            return self._empty_frame()
+        return pd.concat(self._anomalies, ignore_index=True).sort_values(
+            ['Building', 'Timestamp'], ignore_index=True
+        )
+
+def detect_anomalies(df_hourly):
+    """Batch mode: runs a fresh detector over a whole hourly table (Building, Timestamp, kwh)."""
+    logging.info("Detecting anomalies in hourly load.")
+    detector = HourlyAnomalyDetector()
+    detector.update(df_hourly)
+    return detector.anomalies
+
+def write_anomalies(df_anomalies):
+    df_anomalies.to_csv(_output_path(ANOMALIES_FILE), index=False)
+    logging.info(f"Exported {ANOMALIES_FILE} ({len(df_anomalies)} flagged hours)")
+
+# --- Task 3: Object-Oriented Modeling ---
+
+HOUR_NS = 3_600_000_000_000
+DAY_NS = 24 * HOUR_NS
+
+def _to_ns(timestamps):
+    """Converts an array-like of timestamps to int64 nanoseconds since epoch."""
+    return pd.to_datetime(np.asarray(timestamps)).values.astype('datetime64[ns]').view(np.int64)
+
+def _split_by_building(df):
+    """
+    Yields (building name, int64 ns timestamps, float64 kWh) per building from a
+    Task 1 style DataFrame, using one vectorized split and keeping row order.
+    """
+    # Timestamps as int64 nanoseconds, kWh as float64, building names as integer codes
+    timestamps = df.index.values.astype('datetime64[ns]').view(np.int64)
+    kwh = kwh_values(df)
+    codes, names = pd.factorize(df['Building'])
+    
+    # Skip invalid readings (NaT timestamps, missing kWh or building)
+    valid = (timestamps != np.iinfo(np.int64).min) & ~np.isnan(kwh) & (codes >= 0)
+    timestamps, kwh, codes = timestamps[valid], kwh[valid], codes[valid]
+    
+    # Split the rows into one contiguous block per building, keeping their original order
+    order = np.argsort(codes, kind='stable')
+    bounds = np.cumsum(np.bincount(codes, minlength=len(names)))
+    start = 0
+    for code, name in enumerate(names):
+        end = bounds[code]
+        rows = order[start:end]
+        yield name, timestamps[rows], kwh[rows]
+        start = end
+
+def _add_to_buckets(buckets, keys, kwh):
+    """
+    Adds kwh into a {bucket start: kWh} dict, touching only the buckets present in keys.
+    Returns the touched bucket keys.
+    """
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=kwh)
+    touched = uniques.tolist()
+    for key, value in zip(touched, sums.tolist()):
+        buckets[key] = buckets.get(key, 0.0) + value
+    return touched
+
+class MeterReading:
+    """
+    Represents a single meter reading at a specific time.
+    A lightweight view onto one row of a Building's reading arrays.
+    """
+    __slots__ = ('_building', '_index')
+    
+    def __init__(self, building, index):
+        self._building = building
+        self._index = index
+
+    @property
+    def timestamp(self):
+        return pd.Timestamp(self._building.timestamps[self._index])
+
+    @property
+    def kwh(self):
+        return float(self._building.kwh[self._index])
+
+    def __repr__(self):
+        return f"MeterReading({self.timestamp}, {self.kwh})"
+
+class MeterReadingList(Sequence):
+    """Read-only sequence of MeterReading views over a Building's arrays."""
+    __slots__ = ('_building',)
+    
+    def __init__(self, building):
+        self._building = building
+
+    def __len__(self):
+        return len(self._building.kwh)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [MeterReading(self._building, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("meter reading index out of range")
+        return MeterReading(self._building, index)
+
+class Building:
+    """
+    Represents a building with a collection of meter readings.
+    Readings are stored as contiguous arrays: int64 timestamps (ns since
+    epoch) and float64 kWh values. The arrays grow geometrically, so
+    appending k readings costs O(k) amortized. Single readings added with
+    add_reading are buffered and folded into the arrays on the next access.
+    Running count/sum/min/max, the kWh per hour of the day and the hourly,
+    daily and weekly kWh buckets are updated on every append, so live
+    summaries never rescan history.
+    Range queries use a time index (readings sorted by time plus prefix sums
+    of kWh) that is built on first use and extended in place when new
+    readings arrive in time order.
+    """
+    def __init__(self, name):
+        self.name = name
+        self._timestamps = np.empty(0, dtype=np.int64)
+        self._kwh = np.empty(0, dtype=np.float64)
+        self._size = 0
+        self._pending = []
+        self._prefix_kwh = None # prefix_kwh[i] = sum of the first i readings in time order
+        self._count = 0
+        self._total = 0.0
+        self._min = np.inf
+        self._max = -np.inf
+        self._m2 = 0.0 # sum of squared deviations from the mean, for the std
+        self.earliest_hour = None # start (ns since epoch) of the hour of the oldest reading
+        self.latest_hour = None # start (ns since epoch) of the hour of the newest reading
+        self.slot_kwh = np.zeros(24) # kWh per hour of the day
+        # Bucket start (ns since epoch) -> kWh
+        self.hourly_buckets = {}
+        self.hourly_counts = {} # hour start -> number of readings
+        self.daily_buckets = {}
+        self.weekly_buckets = {} # keyed by the week's Sunday, like resample('W')
+        self.dirty_days = set() # daily buckets changed since the manager's daily view was built
+        self.touched_hours = set() # hourly buckets changed since they were last handed out
+
+    @property
+    def timestamps(self):
+        self._flush_pending()
+        return self._timestamps[:self._size]
+
+    @property
+    def kwh(self):
+        self._flush_pending()
+        return self._kwh[:self._size]
+
+    @property
+    def meter_readings(self):
+        """The readings as a sequence of MeterReading views."""
+        return MeterReadingList(self)
+        
+    def add_reading(self, timestamp, kwh):
+        """Adds a new reading to the building."""
+        try:
+            timestamp = pd.Timestamp(timestamp)
+            kwh = float(kwh)
+            if pd.isna(timestamp) or np.isnan(kwh):
+                raise ValueError("missing timestamp or kwh")
+            self._pending.append((timestamp.as_unit('ns').value, kwh))
+        except Exception:
+            # Skip invalid reading, logging handles detailed errors in Task 1
+            pass 
+
+    def add_readings(self, timestamps, kwh):
+        """Adds many readings at once from int64 (ns) timestamp and float64 kWh arrays."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        kwh = np.asarray(kwh, dtype=np.float64)
+        self._flush_pending()
+        if len(kwh) == 0:
+            return
+        self._extend_index(timestamps, kwh)
+        self._append_arrays(timestamps, kwh)
+        self._update_running_stats(timestamps, kwh)
+
+    def _append_arrays(self, timestamps, kwh):
+        new_size = self._size + len(kwh)
+        if new_size > len(self._kwh):
+            capacity = max(new_size, 2 * len(self._kwh))
+            self._timestamps = np.resize(self._timestamps, capacity)
+            self._kwh = np.resize(self._kwh, capacity)
+        self._timestamps[self._size:new_size] = timestamps
+        self._kwh[self._size:new_size] = kwh
+        self._size = new_size
+
+    def _update_running_stats(self, timestamps, kwh):
+        # Merge this batch's spread into the running one (parallel variance formula)
+        batch_mean = float(kwh.mean())
+        batch_m2 = float(((kwh - batch_mean) ** 2).sum())
+        if self._count:
+            delta = batch_mean - self._total / self._count
+            batch_m2 += delta * delta * self._count * len(kwh) / (self._count + len(kwh))
+        self._m2 += batch_m2
+        self._count += len(kwh)
+        self._total += float(kwh.sum())
+        self._min = min(self._min, float(kwh.min()))
+        self._max = max(self._max, float(kwh.max()))
+        
+        hours = timestamps // HOUR_NS
+        days = timestamps // DAY_NS
+        oldest, newest = int(hours.min()) * HOUR_NS, int(hours.max()) * HOUR_NS
+        self.earliest_hour = oldest if self.earliest_hour is None else min(self.earliest_hour, oldest)
+        self.latest_hour = newest if self.latest_hour is None else max(self.latest_hour, newest)
+        self.slot_kwh += np.bincount(hours % 24, weights=kwh, minlength=24)
+        week_ends = days + 6 - _weekday_from_epoch_days(days) # the week's Sunday
+        self.touched_hours.update(_add_to_buckets(self.hourly_buckets, hours * HOUR_NS, kwh))
+        _add_to_buckets(self.hourly_counts, hours * HOUR_NS, np.ones(len(kwh)))
+        self.dirty_days.update(_add_to_buckets(self.daily_buckets, days * DAY_NS, kwh))
+        _add_to_buckets(self.weekly_buckets, week_ends * DAY_NS, kwh)
+
+    def _flush_pending(self):
+        if self._pending:
+            pending_ts, pending_kwh = zip(*self._pending)
+            self._pending = []
+            self.add_readings(pending_ts, pending_kwh)
+        
+    def calculate_total_consumption(self):
+        """Calculates the sum of all kwh readings."""
+        self._flush_pending()
+        return self._total
+
+    def running_stats(self):
+        """Count, mean, min, max, total and std of kWh, maintained as readings are appended."""
+        self._flush_pending()
+        return {
+            'count': self._count,
+            'mean': self._total / self._count if self._count else float('nan'),
+            'min': self._min if self._count else float('nan'),
+            'max': self._max if self._count else float('nan'),
+            'total': self._total,
+            'std': float(np.sqrt(self._m2 / (self._count - 1))) if self._count > 1 else float('nan'),
+        }
+
+    # --- Time-range queries ---
+
+    def _build_index(self):
+        """Sorts the readings by time (stable) and computes prefix sums of kWh."""
+        self._flush_pending()
+        if self._prefix_kwh is not None:
+            return
+        timestamps, kwh = self.timestamps, self.kwh
+        if np.any(np.diff(timestamps) < 0):
+            order = np.argsort(timestamps, kind='stable')
+            timestamps[:] = timestamps[order]
+            kwh[:] = kwh[order]
+        self._prefix_kwh = np.concatenate([[0.0], np.cumsum(kwh)])
+
+    def _extend_index(self, timestamps, kwh):
+        """Extends the prefix sums for readings appended in time order, otherwise drops the index."""
+        if self._prefix_kwh is None:
+            return
+        last = self._timestamps[self._size - 1] if self._size else np.iinfo(np.int64).min
+        if timestamps[0] < last or np.any(np.diff(timestamps) < 0):
+            self._prefix_kwh = None
+            return
+        new_prefix = self._prefix_kwh[self._size] + np.cumsum(kwh)
+        # Grow the prefix buffer geometrically, like the reading arrays
+        end = self._size + 1 + len(kwh)
+        if end > len(self._prefix_kwh):
+            self._prefix_kwh = np.resize(self._prefix_kwh, max(end, 2 * len(self._prefix_kwh)))
+        self._prefix_kwh[self._size + 1:end] = new_prefix
+
+    def query_ranges(self, starts, ends):
+        """
+        Answers many [start, end) ranges in one vectorized call.
+        starts/ends are array-likes of timestamps; returns (counts, totals) arrays.
+        """
+        self._build_index()
+        timestamps = self.timestamps
+        lo = np.searchsorted(timestamps, _to_ns(starts), side='left')
+        hi = np.searchsorted(timestamps, _to_ns(ends), side='left')
+        hi = np.maximum(hi, lo)
+        return hi - lo, self._prefix_kwh[hi] - self._prefix_kwh[lo]
+
+    def count_between(self, start, end):
+        """Number of readings with start <= timestamp < end."""
+        counts, _ = self.query_ranges([start], [end])
+        return int(counts[0])
+
+    def consumption_between(self, start, end):
+        """Total kWh of readings with start <= timestamp < end."""
+        _, totals = self.query_ranges([start], [end])
+        return float(totals[0])
+
+    def average_between(self, start, end):
+        """Mean kWh per reading in [start, end), or NaN if there are none."""
+        counts, totals = self.query_ranges([start], [end])
+        return float(totals[0] / counts[0]) if counts[0] else float('nan')
+
+    def generate_report(self):
+        """Generates a simple usage report string."""
+        total = self.calculate_total_consumption()
+        
+        report = (
+            f"--- Report for Building {self.name} ---\n"
+            f"Total Consumption: {total:,.2f} kWh\n"
+        )
+        return report
+
+
+class BuildingManager:
+    """Manages all Building objects and provides campus-wide statistics."""
+    def __init__(self):
+        self.buildings = {} # Stores Building objects: {'name': Building_Object}
+        self._daily_frame = None # cached daily_totals() table
+        self._daily_rows = {} # building -> (first row in the table, first day, number of days)
+
+    def add_data_from_dataframe(self, df_combined):
+        """Populates the manager with data from the Task 1 DataFrame."""
+        logging.info("Task 3: Populating OOP model.")
+        for name, timestamps, kwh in _split_by_building(df_combined):
+            building = Building(name)
+            building.add_readings(timestamps, kwh)
+            self.buildings[name] = building
+
+    def append_dataframe(self, df_new):
+        """
+        Appends new readings (same layout as the Task 1 DataFrame) to the
+        existing buildings, creating any new ones. Costs O(rows appended).
+        """
+        for name, timestamps, kwh in _split_by_building(df_new):
+            if name not in self.buildings:
+                self.buildings[name] = Building(name)
+            self.buildings[name].add_readings(timestamps, kwh)
+
+    def calculate_campus_total(self):
+        """Calculates total consumption across all buildings."""
+        totals = np.array([b.calculate_total_consumption() for b in self.buildings.values()])
+        return float(totals.sum())
+
+    # --- Live summaries from the running stats and buckets ---
+
+    def summary_frame(self):
+        """Same table as building_wise_summary, built from the running per-building stats."""
+        rows = []
+        for name in sorted(self.buildings):
+            stats = self.buildings[name].running_stats()
+            rows.append({
+                'Building': name,
+                'Mean_kwh': stats['mean'],
+                'Min_kwh': stats['min'],
+                'Max_kwh': stats['max'],
+                'Total_kwh': stats['total'],
+                'Std_kwh': stats['std'],
+            })
+        return pd.DataFrame(rows, columns=['Building', 'Mean_kwh', 'Min_kwh', 'Max_kwh', 'Total_kwh', 'Std_kwh'])
+
+    def hourly_totals(self):
+        """Gap-filled hourly kWh and reading count per building (Building, Timestamp, kwh, count)."""
+        df_hourly = self._bucket_frame('hourly_buckets', HOUR_NS, 'kwh')
+        counts = self._bucket_frame('hourly_counts', HOUR_NS, 'count')
+        df_hourly['count'] = counts['count'].to_numpy(dtype=np.int64)
+        return df_hourly
+
+    def closed_touched_hours(self):
+        """
+        Hourly rows (Building, Timestamp, kwh, count) changed since the last call,
+        limited to each building's closed hours (older than its newest hour, which
+        may still be filling up). Costs O(hours touched), not O(history).
+        """
+        names, keys = [], []
+        for name in sorted(self.buildings):
+            building = self.buildings[name]
+            building._flush_pending()
+            closed = sorted(h for h in building.touched_hours if h < building.latest_hour)
+            building.touched_hours.difference_update(closed)
+            names.extend([name] * len(closed))
+            keys.extend(closed)
+        return pd.DataFrame({
+            'Building': pd.Series(names, dtype=object),
+            'Timestamp': pd.to_datetime(np.array(keys, dtype=np.int64)),
+            'kwh': [self.buildings[n].hourly_buckets[k] for n, k in zip(names, keys)],
+            'count': np.array([self.buildings[n].hourly_counts[k] for n, k in zip(names, keys)], dtype=np.int64),
+        })
+
+    def daily_totals(self):
+        """
+        Same table as calculate_daily_totals, built from the daily buckets.
+        The table is cached; later calls only rewrite the days that changed,
+        and rebuild it when a building gains a day outside its range.
+        """
+        for building in self.buildings.values():
+            building._flush_pending()
+        dirty = {name: b.dirty_days for name, b in self.buildings.items() if b.dirty_days}
+        if self._daily_frame is None or any(
+            name not in self._daily_rows
+            or min(days) < self._daily_rows[name][1]
+            or max(days) >= self._daily_rows[name][1] + self._daily_rows[name][2] * DAY_NS
+            for name, days in dirty.items()
+        ):
+            self._daily_frame = self._bucket_frame('daily_buckets', DAY_NS, 'Daily_kwh_Total')
+            self._daily_rows = {}
+            for name, rows in self._daily_frame.groupby('Building', sort=False).indices.items():
+                first = self._daily_frame['Timestamp'].iat[rows[0]].value
+                self._daily_rows[name] = (int(rows[0]), first, len(rows))
+        elif dirty:
+            positions, values = [], []
+            for name, days in dirty.items():
+                offset, first, _ = self._daily_rows[name]
+                buckets = self.buildings[name].daily_buckets
+                positions.extend(offset + (day - first) // DAY_NS for day in days)
+                values.extend(buckets[day] for day in days)
+            column = self._daily_frame.columns.get_loc('Daily_kwh_Total')
+            self._daily_frame.iloc[positions, column] = values
+        for building in self.buildings.values():
+            building.dirty_days.clear()
+        return self._daily_frame.copy()
+
+    def weekly_totals(self):
+        """Same table as calculate_weekly_aggregates, built from the weekly buckets."""
+        return self._bucket_frame('weekly_buckets', 7 * DAY_NS, 'Weekly_kwh_Total')
+
+    def peak_hour(self):
+        """
+        Hour of the day with the highest average campus-wide hourly load, or None.
+        Uses the per-building kWh per hour of the day, so the cost does not grow with history.
+        """
+        for building in self.buildings.values():
+            building._flush_pending()
+        active = [b for b in self.buildings.values() if b.latest_hour is not None]
+        if not active:
+            return None
+        # Average over every hour in the covered span, counting empty hours as 0
+        first = min(b.earliest_hour for b in active) // HOUR_NS
+        n_hours = max(b.latest_hour for b in active) // HOUR_NS - first + 1
+        hours_per_slot = n_hours // 24 + ((np.arange(24) - first) % 24 < n_hours % 24)
+        kwh_per_slot = np.sum([b.slot_kwh for b in active], axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return int(np.nanargmax(kwh_per_slot / hours_per_slot))
+
+    def _bucket_frame(self, attribute, step_ns, column):
+        """Turns {bucket start: kWh} dicts into a gap-filled long table like resample().sum()."""
+        frames = []
+        for name in sorted(self.buildings):
+            building = self.buildings[name]
+            building._flush_pending()
+            buckets = getattr(building, attribute)
+            if not buckets:
+                continue
+            keys = np.fromiter(buckets.keys(), dtype=np.int64)
+            first = keys.min()
+            values = np.zeros((keys.max() - first) // step_ns + 1)
+            values[(keys - first) // step_ns] = np.fromiter(buckets.values(), dtype=np.float64)
+            frames.append(pd.DataFrame({
+                'Building': name,
+                'Timestamp': pd.to_datetime(first + step_ns * np.arange(len(values))),
+                column: values,
+            }))
+        if not frames:
+            return pd.DataFrame(columns=['Building', 'Timestamp', column])
+        return pd.concat(frames, ignore_index=True)
+
+    def consumption_between(self, building_name, start, end):
+        """Total kWh for one building in [start, end)."""
+        return self.buildings[building_name].consumption_between(start, end)
+
+    def query_ranges(self, building_names, starts, ends):
+        """
+        Batched range queries: row i asks for building_names[i] over [starts[i], ends[i]).
+        Returns a DataFrame with Count, Total_kwh and Mean_kwh per query, in input order.
+        Unknown buildings get a count of 0.
+        """
+        queries = pd.DataFrame({
+            'Building': np.asarray(building_names),
+            'Start': pd.to_datetime(np.asarray(starts)),
+            'End': pd.to_datetime(np.asarray(ends)),
+        })
+        counts = np.zeros(len(queries), dtype=np.int64)
+        totals = np.zeros(len(queries), dtype=np.float64)
+        for name, rows in queries.groupby('Building', sort=False).indices.items():
+            building = self.buildings.get(name)
+            if building is None:
+                continue
+            counts[rows], totals[rows] = building.query_ranges(
+                queries['Start'].to_numpy()[rows], queries['End'].to_numpy()[rows]
+            )
+        queries['Count'] = counts
+        queries['Total_kwh'] = totals
+        with np.errstate(invalid='ignore', divide='ignore'):
+            queries['Mean_kwh'] = np.where(counts > 0, totals / counts, np.nan)
+        return queries
+
+
+# --- Task 4: Visual Output with Matplotlib ---
+
+def generate_dashboard_plots(df_daily, df_weekly, df_combined=None, df_hourly=None, fast=False, df_peak=None):
+    """
+    Generates a three-panel dashboard and saves it as a PNG.
+    The hour-of-day panel uses df_peak (EnergyRollup.hour_of_day_profile) when
+    given; otherwise it is averaged from df_hourly, or from df_combined
+    resampled to hourly.
+    With fast=True the series are downsampled to the pixel budget and the
+    panels are drawn concurrently with the Agg backend (see _render_dashboard_fast).
+    """
+    logging.info("Starting Task 4: Generating visual output.")
+    
+    # --- Data Prep for Scatter Plot ---
+    if df_peak is None:
+        # Resample to hourly to find the hour of the day with high usage
+        if df_hourly is None:
+            df_hourly = df_combined.groupby('Building', observed=True)['kwh'].resample('H').sum().reset_index()
+        df_hourly = df_hourly.assign(Hour=df_hourly['Timestamp'].dt.hour)
+        
+        # Calculate the average hourly consumption per building for stability in the scatter plot
+        df_peak = df_hourly.groupby(['Building', 'Hour'], observed=True)['kwh'].mean().reset_index()
+    
+    # Prepare data for Bar Chart (Average Weekly Usage)
+    avg_weekly = df_weekly.groupby('Building', observed=True)['Weekly_kwh_Total'].mean().reset_index()
+    
+    if fast:
+        _render_dashboard_fast(df_daily, avg_weekly, df_peak, _output_path("dashboard.png"))
+        logging.info("Task 4 complete: Dashboard image saved to output/dashboard.png")
+        return
+
+    # --- Create Figure and Subplots ---
+    # Imported here so runs that do not plot never pay for the plotting stack
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    
+    fig, axes = plt.subplots(3, 1, figsize=(12, 18))
+    plt.style.use('ggplot')
+    
+    # Plot 1: Trend Line (Daily Consumption)
+    sns.lineplot(data=df_daily, x='Timestamp', y='Daily_kwh_Total', hue='Building', ax=axes[0])
+    axes[0].set_title('1. Daily Total Energy Consumption Trend')
+    axes[0].set_ylabel('Total kWh')
+    axes[0].set_xlabel('Date')
+    
+    # Plot 2: Bar Chart (Average Weekly Usage)
+    sns.barplot(data=avg_weekly, x='Building', y='Weekly_kwh_Total', ax=axes[1], palette='viridis')
+    axes[1].set_title('2. Comparison of Average Weekly Consumption')
+    axes[1].set_ylabel('Average Weekly kWh')
+    axes[1].set_xlabel('Building Name')
+
+    # Plot 3: Scatter Plot (Average Consumption by Hour of Day)
+    sns.scatterplot(data=df_peak, x='Hour', y='kwh', hue='Building', ax=axes[2], s=100)
+    axes[2].set_title('3. Average Consumption by Hour of Day (Peak Load Indicator)')
+    axes[2].set_ylabel('Average Hourly kWh')
+    axes[2].set_xlabel('Hour of Day (0-23)')
+    axes[2].set_xticks(range(0, 24, 2))
+    
+    # Final layout adjustments
+    plt.tight_layout()
+    plt.savefig(_output_path("dashboard.png"))
+    logging.info("Task 4 complete: Dashboard image saved to output/dashboard.png")
+    plt.close(fig)
+
+# --- Task 4b: Fast Dashboard Rendering ---
+
+def downsample_minmax(x, y, n_buckets):
+    """
+    Keeps the first, min and max point of each of n_buckets equal-size buckets.
+    Preserves spikes and dips, which is what a line chart shows at pixel scale.
+    """
+    n = len(y)
+    if n <= 3 * n_buckets:
+        return x, y
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.int64)[:-1]
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(edges, n)))
+    # Index of the min and max inside each bucket
+    order_min = np.lexsort((y, bucket))
+    order_max = np.lexsort((-y, bucket))
+    starts = np.searchsorted(bucket[order_min], np.arange(n_buckets))
+    keep = np.unique(np.concatenate([edges, order_min[starts], order_max[starts], [n - 1]]))
+    return x[keep], y[keep]
+
+def downsample_lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling to n_out points: per bucket,
+    keeps the point forming the largest triangle with its neighbours.
+    x must be numeric (e.g. int64 nanoseconds).
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point)
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = xf[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((xf[a] - avg_x) * (y[lo:hi] - y[a]) - (xf[a] - xf[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+# Figure geometry for the fast renderer: each panel is 12 x 6 inches at 100 dpi
+PANEL_SIZE = (12, 6)
+PANEL_DPI = 100
+
+def _render_panel(panel, data):
+    """Draws one dashboard panel with the Agg backend and returns its RGBA pixels."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import matplotlib.style
+
+    with matplotlib.style.context('ggplot'):
+        fig = Figure(figsize=PANEL_SIZE, dpi=PANEL_DPI)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        if panel == 'daily':
+            for name, x, y in data:
+                ax.plot(pd.to_datetime(x), y, label=name, linewidth=1)
+            if 0 < len(data) <= 20:
+                ax.legend(title='Building')
+            ax.set_title('1. Daily Total Energy Consumption Trend')
+            ax.set_ylabel('Total kWh')
+            ax.set_xlabel('Date')
+        elif panel == 'weekly':
+            names, values = data
+            ax.bar(names, values, color=matplotlib.colormaps['viridis'](np.linspace(0, 1, max(len(names), 1))))
+            if len(names) > 20:
+                ax.tick_params(axis='x', labelrotation=90, labelsize=6)
+            ax.set_title('2. Comparison of Average Weekly Consumption')
+            ax.set_ylabel('Average Weekly kWh')
+            ax.set_xlabel('Building Name')
+        else:
+            for name, hours, kwh in data:
+                ax.scatter(hours, kwh, label=name, s=100 if len(data) <= 20 else 15)
+            if 0 < len(data) <= 20:
+                ax.legend(title='Building')
+            ax.set_title('3. Average Consumption by Hour of Day (Peak Load Indicator)')
+            ax.set_ylabel('Average Hourly kWh')
+            ax.set_xlabel('Hour of Day (0-23)')
+            ax.set_xticks(range(0, 24, 2))
+        fig.tight_layout()
+        fig.canvas.draw()
+        return np.asarray(fig.canvas.buffer_rgba()).copy()
+
+def _render_dashboard_fast(df_daily, avg_weekly, df_peak, path, method=None):
+    """
+    Renders the three panels in parallel processes and stacks them into one PNG.
+    Each daily series is first reduced to about one point per horizontal pixel,
+    so rendering time does not grow with the length of the data.
+    """
+    import matplotlib.image
+    
+    method = method or DASHBOARD_DOWNSAMPLE
+    pixel_budget = PANEL_SIZE[0] * PANEL_DPI
+    daily_series = []
+    for name, group in df_daily.groupby('Building', observed=True):
+        x = group['Timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+        y = group['Daily_kwh_Total'].to_numpy(dtype=np.float64)
+        if method == 'lttb':
+            x, y = downsample_lttb(x, y, pixel_budget)
+        else:
+            x, y = downsample_minmax(x, y, pixel_budget // 2)
+        daily_series.append((name, x, y))
+    panels = [
+        ('daily', daily_series),
+        ('weekly', (avg_weekly['Building'].astype(str).tolist(), avg_weekly['Weekly_kwh_Total'].to_numpy())),
+        ('hourly', [(name, g['Hour'].to_numpy(), g['kwh'].to_numpy()) for name, g in df_peak.groupby('Building', observed=True)]),
+    ]
+    workers = min(len(panels), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            images = list(executor.map(_render_panel, *zip(*panels)))
+    else:
+        images = [_render_panel(panel, data) for panel, data in panels]
+    matplotlib.image.imsave(path, np.vstack(images))
+
+# --- Task 5: Persistence and Executive Summary ---
+
+def persist_data(df_combined, df_summary, export_format='csv'):
+    """
+    Exports processed data and summary statistics to CSV files.
+    With export_format='parquet' the cleaned data is written as a partitioned
+    Parquet dataset instead (see write_partitioned_dataset).
+    df_combined is None in streaming mode, where the cleaned rows were
+    already written chunk by chunk; df_summary is None for the ingest command.
+    """
+    logging.info("Starting Task 5: Data Persistence.")
+    
+    if export_format == 'parquet' and importlib.util.find_spec("pyarrow") is None:
+        logging.warning("pyarrow is not installed; exporting cleaned data as CSV instead.")
+        export_format = 'csv'
+    
+    # 1. Export Final processed dataset
+    if df_combined is not None and export_format == 'parquet':
+        write_partitioned_dataset(df_combined, _output_path(PARTITIONED_DATASET))
+        logging.info(f"Exported {PARTITIONED_DATASET}/ (partitioned Parquet)")
+    elif df_combined is not None:
+        df_combined.to_csv(_output_path("cleaned_energy_data.csv"))
+        logging.info("Exported cleaned_energy_data.csv")
+    
+    # 2. Export Summary stats
+    if df_summary is not None:
+        df_summary.to_csv(_output_path("building_summary.csv"), index=False)
+        logging.info("Exported building_summary.csv")
+
+# --- Task 5b: Partitioned Columnar Export ---
+
+PARTITIONED_DATASET = "cleaned_energy_data"
+
+def _partition_dir(root, building, month):
+    return Path(root) / f"building={building}" / f"month={month}"
+
+def write_partitioned_dataset(df, root, compression='zstd', max_workers=None):
+    """
+    Writes the cleaned readings (Timestamp column, kwh, Building, ...) as one
+    compressed Parquet file per building and calendar month:
+    root/building=<name>/month=<YYYY-MM>/part-0.parquet.
+    Partitions are written concurrently; any previous dataset at root is replaced.
+    """
+    root = Path(root)
+    if root.exists():
+        shutil.rmtree(root)
+    months = df['Timestamp'].dt.to_period('M')
+    partitions = df.groupby([df['Building'], months], sort=False, observed=True)
+    
+    def write_partition(key, rows):
+        building, month = key
+        path = _partition_dir(root, building, month)
+        path.mkdir(parents=True, exist_ok=True)
+        df.iloc[rows].to_parquet(path / "part-0.parquet", index=False, compression=compression)
+    
+    # pyarrow releases the GIL while encoding and compressing, so threads write in parallel
+    with ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        futures = [executor.submit(write_partition, key, rows) for key, rows in partitions.indices.items()]
+        for future in futures:
+            future.result()
+    return len(futures)
+
+def load_partitioned_data(root=None, buildings=None, start=None, end=None):
+    """
+    Reads a dataset written by write_partitioned_dataset back into the Task 1
+    layout (Timestamp index). Only partitions for the requested buildings and
+    for months overlapping [start, end) are opened.
+    """
+    root = Path(root) if root is not None else OUTPUT_DIR / PARTITIONED_DATASET
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    wanted = None if buildings is None else {str(b) for b in buildings}
+    
+    files = []
+    for building_dir in sorted(root.glob("building=*")):
+        if wanted is not None and building_dir.name.split("=", 1)[1] not in wanted:
+            continue
+        for month_dir in sorted(building_dir.glob("month=*")):
+            month = pd.Period(month_dir.name.split("=", 1)[1], freq='M')
+            if start is not None and month.end_time < start:
+                continue
+            if end is not None and month.start_time >= end:
+                continue
+            files.extend(sorted(month_dir.glob("*.parquet")))
+    if not files:
+        return pd.DataFrame(columns=['kwh', 'Building'], index=pd.DatetimeIndex([], name='Timestamp'))
+    
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4)) as executor:
+        df = pd.concat(list(executor.map(pd.read_parquet, files)), ignore_index=True)
+    if start is not None:
+        df = df[df['Timestamp'] >= start]
+    if end is not None:
+        df = df[df['Timestamp'] < end]
+    return df.set_index('Timestamp')
+
+# Aggregate tables shared between the aggregate, plot and summarize commands
+AGGREGATE_FILES = {
+    'daily': "daily_totals.csv",
+    'weekly': "weekly_totals.csv",
+    'hourly': "hourly_totals.csv",
+    'summary': "building_summary.csv",
+}
+
+# Reading-level percentiles per building and hour of day (written when a rollup is available)
+PERCENTILES_FILE = "load_percentiles.csv"
+
+def write_aggregates(df_daily, df_weekly, df_hourly, df_percentiles=None):
+    """Exports the daily, weekly and hourly totals so later commands can skip ingestion."""
+    df_daily.to_csv(_output_path(AGGREGATE_FILES['daily']), index=False)
+    df_weekly.to_csv(_output_path(AGGREGATE_FILES['weekly']), index=False)
+    df_hourly[['Building', 'Timestamp', 'kwh']].to_csv(_output_path(AGGREGATE_FILES['hourly']), index=False)
+    logging.info("Exported daily_totals.csv, weekly_totals.csv and hourly_totals.csv")
+    if df_percentiles is not None:
+        df_percentiles.to_csv(_output_path(PERCENTILES_FILE), index=False)
+        logging.info(f"Exported {PERCENTILES_FILE}")
+
+def load_aggregates(output_dir=None):
+    """
+    Reads the tables written by write_aggregates and persist_data from
+    output_dir (default OUTPUT_DIR). Returns None if any is missing.
+    """
+    output_dir = OUTPUT_DIR if output_dir is None else Path(output_dir)
+    missing = [name for name in AGGREGATE_FILES.values() if not (output_dir / name).exists()]
+    if missing:
+        logging.error(f"Missing aggregate files in {output_dir}: {', '.join(missing)}. Run 'aggregate' first.")
+        return None
+    tables = {}
+    for key, name in AGGREGATE_FILES.items():
+        parse_dates = ['Timestamp'] if key != 'summary' else False
+        tables[key] = pd.read_csv(output_dir / name, parse_dates=parse_dates)
+    return tables
+
+def campus_peak_hour(df_hourly):
+    """Hour of the day with the highest average campus-wide hourly load, from hourly totals."""
+    campus = df_hourly.groupby('Timestamp')['kwh'].sum()
+    return _peak_hour_of_day(campus)
+
+def _peak_hour_of_day(campus_hourly):
+    """Averages a campus hourly kWh series (gaps count as 0) by hour of day and returns the peak hour."""
+    campus_hourly = campus_hourly.resample('h').sum()
+    return int(campus_hourly.groupby(campus_hourly.index.hour).mean().idxmax())
+
+def generate_executive_summary(manager, df_daily, df_summary, peak_hour=None, df_anomalies=None):
+    """
+    Creates a concise written report (summary.txt) based on analysis.
+    manager may be None (streaming mode); the campus total then comes from df_summary.
+    peak_hour is the campus peak hour of day from EnergyRollup.peak_hour().
+    df_anomalies (from detect_anomalies) adds a section counting the flagged hours.
+    """
+    
+    # 1. Calculate Core Metrics
+    if manager is not None:
+        total_campus_consumption = manager.calculate_campus_total()
+    else:
+        total_campus_consumption = df_summary['Total_kwh'].sum()
+    
+    # Highest consuming building
+    highest_consumer_row = df_summary.loc[df_summary['Total_kwh'].idxmax()]
+    highest_consumer = highest_consumer_row['Building']
+    highest_kwh = highest_consumer_row['Total_kwh']
+    
+    # Peak Load Time (the hour of the day with the highest *average* usage, computed from hourly data)
+    if peak_hour is not None:
+        peak_load_text = f"The peak average load time across the campus is **Hour {peak_hour}:00**."
+    else:
+        peak_load_text = "Peak load time is not available (no hourly data was provided)."
+    
+    # Weekly/Daily Trends Assessment
+    daily_mean = df_daily['Daily_kwh_Total'].mean()
+    daily_std = df_daily['Daily_kwh_Total'].std()
+    
+    if daily_std / daily_mean > 0.2:
+        trend_note = "Significant variability in daily consumption, suggesting large operational swings or scheduling inefficiencies."
+    else:
+        trend_note = "Relatively stable daily consumption, indicating consistent usage patterns."
+    
+    # 2. Compile Report
+    summary_text = (
+        "=========================================\n"
+        "   ENERGY USAGE EXECUTIVE SUMMARY REPORT\n"
+        "=========================================\n\n"
+        
+        f"**1. Total Campus Consumption:**\n"
+        f"   Total recorded consumption: {total_campus_consumption:,.2f} kWh\n\n"
+        
+        f"**2. Highest Consuming Building:**\n"
+        f"   Building: **{highest_consumer}**\n"
+        f"   Total Consumption: {highest_kwh:,.2f} kWh (See building_summary.csv for details)\n\n"
+        
+        f"**3. Peak Load Time:**\n"
+        f"   {peak_load_text}\n"
+        f"   *Recommendation: Investigate energy-intensive activities and equipment scheduling during this hour.*\n\n"
+        
+        f"**4. Usage Trends:**\n"
+        f"   Analysis shows {trend_note}\n"
+        f"   Refer to 'dashboard.png' for visualization of daily and weekly trends."
+    )
+    
+    # Optional sections, numbered after the four core ones
+    section = 4
+    
+    # Percentile columns are present when the summary came from a rollup with a load sketch
+    if 'P95_kwh' in df_summary.columns:
+        section += 1
+        top_p95 = df_summary.loc[df_summary['P95_kwh'].idxmax()]
+        summary_text += (
+            f"\n\n**{section}. Load Percentiles (per reading, within 1%):**\n"
+            f"   Highest P95 load: Building **{top_p95['Building']}** "
+            f"(P50 {top_p95['P50_kwh']:,.2f} / P95 {top_p95['P95_kwh']:,.2f} / P99 {top_p95['P99_kwh']:,.2f} kWh)\n"
+            f"   Campus median P95 across buildings: {df_summary['P95_kwh'].median():,.2f} kWh\n"
+            f"   *Recommendation: Size capacity for the P95-P99 range; see load_percentiles.csv for each hour of the day.*"
+        )
+    
+    # Cost columns are present when a tariff was configured
+    if 'Total_cost' in df_summary.columns:
+        section += 1
+        top_cost = df_summary.loc[df_summary['Total_cost'].idxmax()]
+        total_cost = df_summary['Total_cost'].sum()
+        currency = active_tariff().currency if TARIFF is not None else ''
+        summary_text += (
+            f"\n\n**{section}. Energy Cost (time-of-use tariff):**\n"
+            f"   Total campus cost: {currency}{total_cost:,.2f} "
+            f"(average {currency}{total_cost / df_summary['Total_kwh'].sum():.4f} per kWh)\n"
+            f"   Highest cost building: **{top_cost['Building']}** at {currency}{top_cost['Total_cost']:,.2f}\n"
+            f"   *Recommendation: Shift flexible loads out of peak bands; per-building costs are in building_summary.csv.*"
+        )
+    
+    if df_anomalies is not None:
+        section += 1
+        kinds = df_anomalies['kind'].value_counts()
+        summary_text += (
+            f"\n\n**{section}. Anomalies (hourly load):**\n"
+            f"   {len(df_anomalies)} flagged hours in {df_anomalies['Building'].nunique()} buildings: "
+            f"{kinds.get('spike', 0)} spikes, {kinds.get('drop', 0)} drops (possible outages)\n"
+            f"   *Recommendation: Review the flagged hours in {ANOMALIES_FILE} with facilities staff.*"
+        )
+    
+    # 3. Save Report
+    with open(_output_path("summary.txt"), "w") as f:
+        f.write(summary_text)
+        
+    print("\n" + summary_text)
+    logging.info("Task 5 complete: Executive summary saved to output/summary.txt")
+
+
+# --- Task 6: Live Append Mode ---
+
+class DataDirectoryWatcher:
+    """
+    Polls DATA_DIR for new CSV files and for rows appended to known files.
+    Only the bytes added since the previous poll are parsed; a trailing
+    partial line is left for the next poll.
+    """
+    def __init__(self, data_dir):
+        self.data_dir = Path(data_dir)
+        self.offsets = {} # path -> number of bytes already ingested
+
+    def poll(self):
+        """Returns the new, cleaned rows as a Task 1 style DataFrame (or None)."""
+        frames = []
+        current = set(self.data_dir.glob("*.csv")) if self.data_dir.is_dir() else set()
+        for file_path in [p for p in self.offsets if p not in current]:
+            del self.offsets[file_path]
+        for file_path in sorted(current):
+            df = self._read_new_rows(file_path)
+            if df is not None and not df.empty:
+                frames.append(df)
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True).set_index('Timestamp')
+
+    def _read_new_rows(self, file_path):
+        file_name = file_path.name
+        offset = self.offsets.get(file_path, 0)
+        try:
+            size = file_path.stat().st_size
+            if size < offset:
+                # The file was truncated or replaced; skip what is there to avoid double counting
+                logging.warning(f"{file_name} shrank since the last poll; waiting for new rows.")
+                self.offsets[file_path] = size
+                return None
+            if size == offset:
+                return None
+            with open(file_path, "rb") as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            complete = data.rfind(b"\n") + 1
+            if complete == 0:
+                return None
+            self.offsets[file_path] = offset + complete
+            df = pd.read_csv(
+                io.BytesIO(data[:complete]),
+                header=0 if offset == 0 else None, # only the start of a file has a header row
+                on_bad_lines='skip'
+            )
+            df = _prepare_readings(df, _building_name_from_file(file_name))
+            logging.info(f"Ingested {len(df):,} new rows from {file_name}")
+            return df
+        except FileNotFoundError:
+            logging.error(f"Missing file error: {file_name}")
+        except Exception as e:
+            logging.error(f"An unexpected error occurred while processing {file_name}: {e}")
+        return None
+
+def write_live_summary(manager, detector=None):
+    """
+    Rewrites building_summary.csv and summary.txt from the manager's running aggregates.
+    With a detector, the hours completed since the last update are checked for
+    anomalies. Each building's newest hour may still be filling up, so it waits
+    for a later poll; buildings whose files lag behind others are closed at their
+    own pace. Only the hours touched since the last poll are handed over.
+    """
+    df_summary = manager.summary_frame()
+    df_summary.to_csv(_output_path("building_summary.csv"), index=False)
+    df_anomalies = None
+    if detector is not None:
+        detector.update(manager.closed_touched_hours())
+        df_anomalies = detector.anomalies
+        write_anomalies(df_anomalies)
+    generate_executive_summary(
+        manager, manager.daily_totals(), df_summary, peak_hour=manager.peak_hour(), df_anomalies=df_anomalies
+    )
+
+def run_live_pipeline(poll_seconds, max_polls=None):
+    """
+    Watches DATA_DIR and keeps the summary outputs current as rows arrive.
+    Each poll ingests only new rows and updates the running aggregates,
+    so the work per update is proportional to the new data.
+    """
+    logging.info(f"Live mode: watching {DATA_DIR} every {poll_seconds}s (Ctrl+C to stop).")
+    manager = BuildingManager()
+    watcher = DataDirectoryWatcher(DATA_DIR)
+    detector = HourlyAnomalyDetector()
+    polls = 0
+    try:
+        while True:
+            df_new = watcher.poll()
+            if df_new is not None:
+                manager.append_dataframe(df_new)
+                write_live_summary(manager, detector)
+            polls += 1
+            if max_polls is not None and polls >= max_polls:
+                break
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        logging.info("Live mode stopped.")
+    return manager
+
+# --- Main Execution Block ---
+
+def main():
+    """Runs the complete energy dashboard pipeline. Returns 0 on success, 1 if it stopped for lack of data."""
+    logging.info("--- Starting Energy Dashboard Pipeline ---")
+    
+    if LIVE_POLL_SECONDS:
+        run_live_pipeline(LIVE_POLL_SECONDS)
+        return 0
+    
+    metrics = PipelineMetrics(COLLECT_METRICS, PROFILE_STAGES, OUTPUT_DIR / "profiles")
+    
+    if STREAM_CHUNKSIZE:
+        status = run_streaming_pipeline(STREAM_CHUNKSIZE, metrics)
+        metrics.write(OUTPUT_DIR / "metrics.json")
+        return status
+    
+    # 0. Stage cache lookup: stages whose inputs and settings are unchanged are skipped
+    with metrics.stage('stage_cache') as m:
+        cache = StageCache(STAGE_CACHE_DIR or OUTPUT_DIR / "stage_cache", STAGE_CACHE_MAX_MB * 2**20, enabled=STAGE_CACHE)
+        keys = stage_cache_keys() if STAGE_CACHE else {}
+        cached = {}
+        for name, key in keys.items():
+            hit, value = cache.lookup(key)
+            if hit:
+                cached[name] = value
+        m['rows_out'] = len(cached)
+    if cached:
+        logging.info(f"Reusing cached results for: {', '.join(cached)}")
+    
+    # 1. Ingestion and Validation (only when a stage that reads the rows has to run)
+    df_combined = n_rows = None
+    if not {'aggregate', 'persist', 'summarize'} <= cached.keys():
+        with metrics.stage('ingest') as m:
+            df_combined = ingest_and_validate_data(workers=INGEST_WORKERS, use_cache=INGEST_CACHE, compact=COMPACT_DTYPES)
+            m['rows_out'] = 0 if df_combined is None else len(df_combined)
+        if df_combined is None or df_combined.empty:
+            logging.error("Pipeline aborted: Cannot proceed without valid data.")
+            metrics.write(OUTPUT_DIR / "metrics.json")
+            return 1
+        n_rows = len(df_combined)
+
+    # 2. Core Aggregation (one scan into the rollup engine; every view is derived from it)
+    with metrics.stage('aggregate', rows_in=n_rows) as m:
+        if 'aggregate' in cached:
+            aggregates = cached['aggregate']
+            m['cached'] = True
+        else:
+            rollup = EnergyRollup.from_dataframe(df_combined)
+            df_summary, _ = rollup.building_summary(tariff=active_tariff())
+            aggregates = {
+                'daily': rollup.daily_totals(),
+                'weekly': rollup.weekly_totals(),
+                'summary': df_summary,
+                'hourly': rollup.hourly_totals(),
+                'percentiles': rollup.hour_of_day_percentiles(),
+                'peak_hour': rollup.peak_hour(),
+                'hour_profile': rollup.hour_of_day_profile(),
+            }
+            cache.store(keys.get('aggregate'), 'aggregate', aggregates)
+        df_daily, df_weekly, df_summary, df_hourly = (aggregates[k] for k in ('daily', 'weekly', 'summary', 'hourly'))
+        m['rows_out'] = len(df_daily) + len(df_weekly) + len(df_summary) + len(df_hourly)
+    with metrics.stage('detect_anomalies', rows_in=len(df_hourly)) as m:
+        if 'detect_anomalies' in cached:
+            df_anomalies = cached['detect_anomalies']
+            m['cached'] = True
+        else:
+            df_anomalies = detect_anomalies(df_hourly)
+            cache.store(keys.get('detect_anomalies'), 'detect_anomalies', df_anomalies)
+        m['rows_out'] = len(df_anomalies)
+    
+    # 3. Object-Oriented Modeling (only feeds the executive summary)
+    manager = None
+    if 'summarize' not in cached:
+        with metrics.stage('build_model', rows_in=n_rows) as m:
+            manager = BuildingManager()
+            manager.add_data_from_dataframe(df_combined)
+            m['rows_out'] = len(manager.buildings)
+
+    # 4. Visual Output
+    with metrics.stage('plot', rows_in=len(df_daily) + len(df_weekly) + len(df_hourly)) as m:
+        if 'plot' in cached:
+            m['cached'] = True
+        else:
+            generate_dashboard_plots(df_daily, df_weekly, fast=FAST_DASHBOARD, df_peak=aggregates['hour_profile'])
+            cache.store(keys.get('plot'), 'plot', files=[OUTPUT_DIR / "dashboard.png"])
+        m['rows_out'] = 1
+    
+    # 5. Persistence and Executive Summary
+    with metrics.stage('persist', rows_in=n_rows) as m:
+        if 'persist' in cached:
+            m['cached'] = True
+        else:
+            persist_data(df_combined.reset_index(), df_summary, EXPORT_FORMAT) # Reset index for clean export
+            write_aggregates(df_daily, df_weekly, df_hourly, aggregates['percentiles'])
+            write_anomalies(df_anomalies)
+            cache.store(keys.get('persist'), 'persist', files=_persisted_files(), in_place=_exported_files())
+        m['rows_out'] = len(df_summary) + len(df_daily) + len(df_weekly) + len(df_hourly) + (n_rows or 0)
+    with metrics.stage('summarize', rows_in=len(df_daily) + len(df_summary)) as m:
+        if 'summarize' in cached:
+            print("\n" + (OUTPUT_DIR / "summary.txt").read_text())
+            m['cached'] = True
+        else:
+            generate_executive_summary(manager, df_daily, df_summary, peak_hour=aggregates['peak_hour'], df_anomalies=df_anomalies)
+            cache.store(keys.get('summarize'), 'summarize', files=[OUTPUT_DIR / "summary.txt"])
+        m['rows_out'] = 1
+    
+    metrics.write(OUTPUT_DIR / "metrics.json")
+    logging.info("--- Pipeline Completed Successfully ---")
+    return 0
+
+def _persisted_files():
+    """Small files written by the persist stage of main() (aggregates, anomalies), copied into the stage cache."""
+    files = [OUTPUT_DIR / name for name in (*AGGREGATE_FILES.values(), PERCENTILES_FILE, ANOMALIES_FILE)]
+    return [path for path in files if path.exists()]
+
+def _exported_files():
+    """The cleaned export written by the persist stage, checked in place rather than copied."""
+    dataset = OUTPUT_DIR / PARTITIONED_DATASET
+    if dataset.is_dir() and EXPORT_FORMAT == 'parquet':
+        files = sorted(dataset.rglob("*.parquet"))
+    else:
+        files = [OUTPUT_DIR / "cleaned_energy_data.csv"]
+    return [path for path in files if path.exists()]
+
+def run_streaming_pipeline(chunksize, metrics=None):
+    """
+    Runs the pipeline out-of-core: aggregates, plots and the summary are all
+    derived from partial aggregates, and the cleaned rows are exported chunk
+    by chunk (always as CSV). The per-reading OOP model (Task 3) is skipped in this mode.
+    Returns 0 on success, 1 if there was no valid data.
+    """
+    metrics = metrics or PipelineMetrics()
+    
+    # 1 + 2. Streaming Ingestion and Aggregation
+    with metrics.stage('ingest_streaming') as m:
+        rollup = stream_and_aggregate_data(chunksize, cleaned_csv_path=_output_path("cleaned_energy_data.csv"))
+        m['rows_out'] = 0 if rollup is None else len(rollup.base_table)
+    if rollup is None:
+        logging.error("Pipeline aborted: Cannot proceed without valid data.")
+        return 1
+    logging.info("Exported cleaned_energy_data.csv")
+    with metrics.stage('aggregate', rows_in=len(rollup.base_table)) as m:
+        df_daily = rollup.daily_totals()
+        df_weekly = rollup.weekly_totals()
+        df_summary, summary_dict = rollup.building_summary(tariff=active_tariff())
+        df_hourly = rollup.hourly_totals()
+        peak_hour = rollup.peak_hour()
+        df_peak = rollup.hour_of_day_profile()
+        m['rows_out'] = len(df_daily) + len(df_weekly) + len(df_summary) + len(df_hourly)
+    with metrics.stage('detect_anomalies', rows_in=len(df_hourly)) as m:
+        df_anomalies = detect_anomalies(df_hourly)
+        m['rows_out'] = len(df_anomalies)
+    
+    # 4. Visual Output
+    with metrics.stage('plot', rows_in=len(df_daily) + len(df_weekly) + len(df_hourly)) as m:
+        generate_dashboard_plots(df_daily, df_weekly, fast=FAST_DASHBOARD, df_peak=df_peak)
+        m['rows_out'] = 1
+    
+    # 5. Persistence and Executive Summary
+    with metrics.stage('persist', rows_in=len(df_summary)) as m:
+        persist_data(None, df_summary)
+        write_aggregates(df_daily, df_weekly, df_hourly, rollup.hour_of_day_percentiles())
+        write_anomalies(df_anomalies)
+        m['rows_out'] = len(df_summary) + len(df_daily) + len(df_weekly) + len(df_hourly)
+    with metrics.stage('summarize', rows_in=len(df_daily) + len(df_summary)) as m:
+        generate_executive_summary(None, df_daily, df_summary, peak_hour=peak_hour, df_anomalies=df_anomalies)
+        m['rows_out'] = 1
+    
+    logging.info("--- Pipeline Completed Successfully ---")
+    return 0
+
+# --- Command-Line Interface ---
+
+def cmd_ingest(args):
+    """Parses DATA_DIR (using the ingest cache) and exports cleaned_energy_data.csv."""
+    df_combined = ingest_and_validate_data(workers=INGEST_WORKERS, use_cache=INGEST_CACHE, compact=COMPACT_DTYPES)
+    if df_combined is None or df_combined.empty:
+        logging.error("Ingestion produced no valid data.")
+        return 1
+    persist_data(df_combined.reset_index(), None, EXPORT_FORMAT)
+    return 0
+
+def cmd_aggregate(args):
+    """Builds the rollup and writes building_summary.csv plus the daily/weekly/hourly totals."""
+    if AGGREGATE_SHARDS:
+        rollup = sharded_aggregate(AGGREGATE_SHARDS, workers=INGEST_WORKERS if INGEST_WORKERS > 1 else None)
+    elif STREAM_CHUNKSIZE:
+        rollup = stream_and_aggregate_data(STREAM_CHUNKSIZE)
+    else:
+        df_combined = ingest_and_validate_data(workers=INGEST_WORKERS, use_cache=INGEST_CACHE, compact=COMPACT_DTYPES)
+        rollup = None if df_combined is None or df_combined.empty else EnergyRollup.from_dataframe(df_combined)
+    if rollup is None:
+        logging.error("Aggregation aborted: no valid data.")
+        return 1
+    df_summary, _ = rollup.building_summary(tariff=active_tariff())
+    persist_data(None, df_summary)
+    df_hourly = rollup.hourly_totals()
+    write_aggregates(rollup.daily_totals(), rollup.weekly_totals(), df_hourly, rollup.hour_of_day_percentiles())
+    write_anomalies(detect_anomalies(df_hourly))
+    return 0
+
+def cmd_shard(args):
+    """Rolls up one shard of the buildings into the shared shard folder (multi-machine map step)."""
+    if not 0 <= args.index < args.num_shards:
+        logging.error(f"--index must be between 0 and {args.num_shards - 1}.")
+        return 2
+    path = write_shard(args.index, args.num_shards, SHARD_DIR or OUTPUT_DIR / "shards")
+    return 0 if path is not None else 1
+
+def cmd_reduce(args):
+    """Merges all shard partials and writes building_summary.csv plus the daily/weekly/hourly totals."""
+    rollup = reduce_shards(SHARD_DIR or OUTPUT_DIR / "shards", args.num_shards)
+    if rollup is None:
+        logging.error("Reduce aborted: no valid data.")
+        return 1
+    df_summary, _ = rollup.building_summary(tariff=active_tariff())
+    persist_data(None, df_summary)
+    df_hourly = rollup.hourly_totals()
+    write_aggregates(rollup.daily_totals(), rollup.weekly_totals(), df_hourly, rollup.hour_of_day_percentiles())
+    write_anomalies(detect_anomalies(df_hourly))
+    return 0
+
+def cmd_plot(args):
+    """Draws dashboard.png from the stored aggregates."""
+    tables = load_aggregates()
+    if tables is None:
+        return 1
+    generate_dashboard_plots(tables['daily'], tables['weekly'], df_hourly=tables['hourly'], fast=FAST_DASHBOARD)
+    return 0
+
+def cmd_summarize(args):
+    """Writes summary.txt from the stored aggregates without touching the raw data."""
+    tables = load_aggregates()
+    if tables is None:
+        return 1
+    anomalies_path = OUTPUT_DIR / ANOMALIES_FILE
+    df_anomalies = pd.read_csv(anomalies_path) if anomalies_path.exists() else None
+    generate_executive_summary(
+        None, tables['daily'], tables['summary'], peak_hour=campus_peak_hour(tables['hourly']),
+        df_anomalies=df_anomalies,
+    )
+    return 0
+
+def cmd_run(args):
+    """Runs the complete pipeline (the default when no command is given)."""
+    return main()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Campus energy dashboard pipeline.")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="folder with building CSV files")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR, help="folder for all outputs")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="processes used to parse CSV files")
+    parser.add_argument("--no-cache", action="store_true", help="disable the ingest and stage caches")
+    parser.add_argument("--chunksize", type=int, default=STREAM_CHUNKSIZE, help="stream files in chunks of this many rows")
+    parser.add_argument("--watch", type=float, default=LIVE_POLL_SECONDS, metavar="SECONDS", help="live mode: poll DATA_DIR every SECONDS")
+    parser.add_argument("--shards", type=int, default=AGGREGATE_SHARDS,
+                        help="aggregate: split the buildings into this many shards on a process pool")
+    parser.add_argument("--shard-dir", type=Path, default=SHARD_DIR,
+                        help="shared folder for shard partials (default OUTPUT_DIR/shards)")
+    parser.add_argument("--tariff", type=Path, default=None,
+                        help="JSON time-of-use tariff; adds building costs to the summary")
+    parser.add_argument("--compact", action="store_true",
+                        help="categorical building codes and float32 kWh for the combined frame")
+    parser.add_argument("--export-format", choices=["csv", "parquet"], default=EXPORT_FORMAT,
+                        help="cleaned data as one CSV or as Parquet partitioned by building and month")
+    parser.add_argument("--fast-dashboard", action="store_true", help="downsample series and draw panels in parallel")
+    parser.add_argument("--downsample", choices=["minmax", "lttb"], default=DASHBOARD_DOWNSAMPLE)
+    parser.add_argument("--metrics", action="store_true", help="write per-stage metrics to metrics.json")
+    parser.add_argument("--profile", action="store_true", help="also dump a cProfile file per stage")
+    parser.add_argument("--quiet", action="store_true", help="only log warnings and errors")
+    
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    for name, handler in [("run", cmd_run), ("ingest", cmd_ingest), ("aggregate", cmd_aggregate),
+                          ("plot", cmd_plot), ("summarize", cmd_summarize)]:
+        command = commands.add_parser(name, help=handler.__doc__.splitlines()[0])
+        command.set_defaults(handler=handler)
+    shard = commands.add_parser("shard", help=cmd_shard.__doc__.splitlines()[0])
+    shard.add_argument("--index", type=int, required=True, help="this machine's shard (0-based)")
+    shard.add_argument("--num-shards", type=int, required=True)
+    shard.set_defaults(handler=cmd_shard)
+    reduce = commands.add_parser("reduce", help=cmd_reduce.__doc__.splitlines()[0])
+    reduce.add_argument("--num-shards", type=int, required=True)
+    reduce.set_defaults(handler=cmd_reduce)
+    parser.set_defaults(handler=cmd_run)
+    return parser
+
+def cli(argv=None):
+    """Entry point: applies the command-line options to the module settings and runs a command."""
+    global DATA_DIR, OUTPUT_DIR, INGEST_WORKERS, INGEST_CACHE, STREAM_CHUNKSIZE, LIVE_POLL_SECONDS
+    global FAST_DASHBOARD, DASHBOARD_DOWNSAMPLE, COLLECT_METRICS, PROFILE_STAGES, EXPORT_FORMAT, COMPACT_DTYPES
+    global AGGREGATE_SHARDS, SHARD_DIR, TARIFF, STAGE_CACHE
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format=LOG_FORMAT)
+    # The CLI only saves the dashboard to a file, so default to the non-interactive
+    # backend (without importing matplotlib); an MPLBACKEND set by the user still wins
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    
+    DATA_DIR = args.data_dir
+    OUTPUT_DIR = args.output_dir
+    INGEST_WORKERS = args.workers
+    INGEST_CACHE = INGEST_CACHE and not args.no_cache
+    STAGE_CACHE = STAGE_CACHE and not args.no_cache
+    STREAM_CHUNKSIZE = args.chunksize
+    LIVE_POLL_SECONDS = args.watch
+    EXPORT_FORMAT = args.export_format
+    COMPACT_DTYPES = COMPACT_DTYPES or args.compact
+    AGGREGATE_SHARDS = args.shards
+    if args.tariff is not None:
+        try:
+            TariffSchedule.from_config(args.tariff)
+        except (OSError, ValueError, KeyError) as e:
+            logging.error(f"Could not load tariff {args.tariff}: {e}")
+            return 2
+        TARIFF = args.tariff
+    SHARD_DIR = args.shard_dir
+    FAST_DASHBOARD = FAST_DASHBOARD or args.fast_dashboard
+    DASHBOARD_DOWNSAMPLE = args.downsample
+    COLLECT_METRICS = COLLECT_METRICS or args.metrics
+    PROFILE_STAGES = PROFILE_STAGES or args.profile
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,318 @@
+# service.py
+#
+# Local HTTP service that answers energy queries from the precomputed
+# aggregates (building_summary.csv, daily/weekly/hourly_totals.csv) instead of
+# rerunning the pipeline. Run `python main.py aggregate` (or a full run) first.
+#
+# Example:
+#   python service.py --output-dir output --port 8765
+#   curl "http://127.0.0.1:8765/consumption?building=B001&freq=daily&start=2024-02-01&end=2024-03-01"
+#
+# Endpoints (all GET, JSON responses):
+#   /buildings                       building names and their summary rows
+#   /summary?building=B              summary row for one building
+#   /consumption?building=B&freq=daily|weekly|hourly&start=..&end=..
+#                                    total and series for [start, end); no building = whole campus
+#   /peak-hour?start=..&end=..       campus peak hour of day within [start, end)
+#   /health                          load time, cache statistics
+#   /reload                          reload the aggregates and clear the cache
+#
+# The aggregate files are checked on every request; when a pipeline run
+# rewrites them the tables are reloaded and the result cache is cleared.
+
+import argparse
+import asyncio
+import inspect
+import json
+import logging
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+import pandas as pd
+
+# Allow importing the pipeline from this folder
+sys.path.append(str(Path(__file__).resolve().parent))
+
+import main as pipeline
+
+# Value column of each time-series aggregate
+SERIES_COLUMNS = {'daily': 'Daily_kwh_Total', 'weekly': 'Weekly_kwh_Total', 'hourly': 'kwh'}
+
+class QueryError(Exception):
+    """A bad request; `status` is the HTTP status to answer with."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class LRUCache:
+    """A small least-recently-used cache for query results."""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class BuildingSeries:
+    """One building's time series as sorted int64 ns timestamps with a kWh prefix sum."""
+    def __init__(self, timestamps, kwh):
+        order = np.argsort(timestamps, kind='stable')
+        self.timestamps = timestamps[order]
+        self.kwh = kwh[order]
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.kwh)))
+
+    def window(self, start_ns, end_ns):
+        """Index range [lo, hi) of the points with start <= timestamp < end."""
+        lo = 0 if start_ns is None else np.searchsorted(self.timestamps, start_ns, side='left')
+        hi = len(self.timestamps) if end_ns is None else np.searchsorted(self.timestamps, end_ns, side='left')
+        return int(lo), int(max(lo, hi))
+
+    def total(self, lo, hi):
+        return float(self.prefix[hi] - self.prefix[lo])
+
+class AggregateStore:
+    """
+    Holds the aggregate tables in memory, split per building for binary-search
+    range queries, and reloads them when the files on disk change.
+    """
+    def __init__(self, output_dir, cache_size=256):
+        self.output_dir = Path(output_dir)
+        self.cache = LRUCache(cache_size)
+        self.loaded_at = None
+        self._mtimes = None
+        self.summary = None
+        self.series = {}
+
+    def _file_mtimes(self):
+        mtimes = {}
+        for name in pipeline.AGGREGATE_FILES.values():
+            try:
+                mtimes[name] = (self.output_dir / name).stat().st_mtime_ns
+            except FileNotFoundError:
+                mtimes[name] = None
+        return mtimes
+
+    def is_stale(self):
+        return self._mtimes != self._file_mtimes()
+
+    def reload(self):
+        """Loads all aggregate tables and clears the result cache."""
+        mtimes = self._file_mtimes()
+        tables = pipeline.load_aggregates(self.output_dir)
+        if tables is None:
+            raise QueryError(f"Aggregates are missing in {self.output_dir}; run 'python main.py aggregate'.", 503)
+        summary = tables['summary']
+        summary['Building'] = summary['Building'].astype(str)
+        series = {}
+        for freq, column in SERIES_COLUMNS.items():
+            frame = tables[freq]
+            timestamps = frame['Timestamp'].to_numpy().astype('datetime64[ns]').view(np.int64)
+            kwh = frame[column].to_numpy(dtype=np.float64)
+            codes, names = pd.factorize(frame['Building'].astype(str))
+            order = np.argsort(codes, kind='stable')
+            bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(names)))))
+            series[freq] = {
+                name: BuildingSeries(timestamps[order[bounds[i]:bounds[i + 1]]], kwh[order[bounds[i]:bounds[i + 1]]])
+                for i, name in enumerate(names)
+            }
+            series[freq][None] = BuildingSeries(timestamps, kwh) # whole campus
+        self.summary = summary.set_index('Building', drop=False)
+        self.series = series
+        self._mtimes = mtimes
+        self.loaded_at = time.time()
+        self.cache.clear()
+        logging.info(f"Loaded aggregates from {self.output_dir} ({len(summary)} buildings).")
+
+    # --- Queries (results are plain JSON-ready dicts) ---
+
+    def query(self, path, params):
+        """Answers one request from the cache or by running the matching query."""
+        handlers = {
+            '/buildings': self.buildings,
+            '/summary': self.building_summary,
+            '/consumption': self.consumption,
+            '/peak-hour': self.peak_hour,
+        }
+        if path not in handlers:
+            raise QueryError(f"Unknown endpoint {path}", 404)
+        try:
+            inspect.signature(handlers[path]).bind(**params)
+        except TypeError:
+            raise QueryError(f"Unsupported parameters for {path}: {', '.join(params)}")
+        key = (path, tuple(sorted(params.items())))
+        result = self.cache.get(key)
+        if result is None:
+            result = handlers[path](**params)
+            self.cache.put(key, result)
+        return result
+
+    def buildings(self):
+        return {'buildings': self.summary.to_dict('records')}
+
+    def building_summary(self, building=None):
+        if building is None:
+            raise QueryError("Missing parameter: building")
+        if building not in self.summary.index:
+            raise QueryError(f"Unknown building {building!r}", 404)
+        return self.summary.loc[[building]].to_dict('records')[0]
+
+    def consumption(self, building=None, freq='daily', start=None, end=None):
+        if freq not in self.series:
+            raise QueryError(f"freq must be one of {', '.join(SERIES_COLUMNS)}")
+        if building is not None and building not in self.series[freq]:
+            raise QueryError(f"Unknown building {building!r}", 404)
+        start_ns, end_ns = _parse_time(start), _parse_time(end)
+        series = self.series[freq][building]
+        lo, hi = series.window(start_ns, end_ns)
+        points = pd.Series(series.kwh[lo:hi], index=pd.to_datetime(series.timestamps[lo:hi]))
+        if building is None:
+            points = points.groupby(level=0).sum() # campus: add up the buildings per period
+        return {
+            'building': building,
+            'freq': freq,
+            'start': start,
+            'end': end,
+            'total_kwh': series.total(lo, hi),
+            'points': [[ts.isoformat(), value] for ts, value in zip(points.index, points.to_numpy().tolist())],
+        }
+
+    def peak_hour(self, start=None, end=None):
+        series = self.series['hourly'][None]
+        lo, hi = series.window(_parse_time(start), _parse_time(end))
+        if lo == hi:
+            raise QueryError("No hourly data in the requested range", 404)
+        campus = pd.Series(series.kwh[lo:hi], index=pd.to_datetime(series.timestamps[lo:hi]))
+        campus = campus.groupby(level=0).sum()
+        return {'start': start, 'end': end, 'peak_hour': pipeline._peak_hour_of_day(campus)}
+
+    def health(self):
+        return {
+            'output_dir': str(self.output_dir),
+            'loaded_at': self.loaded_at,
+            'cache_entries': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+        }
+
+def _json_ready(value):
+    """Replaces NaN and infinite floats (e.g. an empty building's mean) with None, recursively."""
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _json_ready(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_ready(item) for item in value]
+    return value
+
+def _parse_time(value):
+    """Query-string timestamp -> int64 ns (None stays None)."""
+    if value is None:
+        return None
+    try:
+        return pd.Timestamp(value).value
+    except ValueError:
+        raise QueryError(f"Invalid timestamp {value!r}")
+
+class EnergyService:
+    """Minimal asyncio HTTP/1.1 front end for an AggregateStore (GET only, one request per connection)."""
+    def __init__(self, store):
+        self.store = store
+        self._reload_lock = asyncio.Lock()
+
+    async def _ensure_fresh(self, force=False):
+        async with self._reload_lock:
+            if force or self.store.is_stale():
+                # Loading CSVs blocks, so keep it off the event loop
+                await asyncio.to_thread(self.store.reload)
+
+    async def dispatch(self, target):
+        """Returns (status, body dict) for a request target like '/consumption?building=A'."""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        try:
+            if url.path == '/reload':
+                await self._ensure_fresh(force=True)
+                return 200, {'reloaded': True, **self.store.health()}
+            await self._ensure_fresh()
+            if url.path == '/health':
+                return 200, self.store.health()
+            return 200, self.store.query(url.path, params)
+        except QueryError as e:
+            return e.status, {'error': str(e)}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass # headers are not needed
+            if len(request_line) < 2 or request_line[0] != 'GET':
+                status, body = 405, {'error': "Only GET is supported"}
+            else:
+                start = time.perf_counter()
+                status, body = await self.dispatch(request_line[1])
+                logging.info(f"{request_line[0]} {request_line[1]} -> {status} ({(time.perf_counter() - start) * 1000:.1f} ms)")
+            payload = json.dumps(_json_ready(body), default=str, allow_nan=False).encode()
+            reason = {
+                200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 503: 'Service Unavailable',
+            }.get(status, 'Error')
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+async def serve(store, host, port):
+    service = EnergyService(store)
+    await service._ensure_fresh(force=True)
+    server = await asyncio.start_server(service.handle, host, port)
+    logging.info(f"Serving energy aggregates on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve queries over the precomputed energy aggregates.")
+    parser.add_argument("--output-dir", type=Path, default=pipeline.OUTPUT_DIR, help="where the aggregate CSVs are")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=256, help="number of query results kept in the LRU cache")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format=pipeline.LOG_FORMAT)
+    store = AggregateStore(args.output_dir, args.cache_size)
+    try:
+        asyncio.run(serve(store, args.host, args.port))
+    except QueryError as e:
+        logging.error(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
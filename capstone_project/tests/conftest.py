@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The pipeline is a script, not a package: make main.py importable
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def make_readings(seed=0, buildings=("Alpha", "Beta", "Gamma"), days=45):
+    """Task 1 style frame (Timestamp index, Building, kwh) of 15-minute readings with gaps."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, name in enumerate(buildings):
+        stamps = pd.date_range("2024-01-01", periods=days * 96, freq="15min") + pd.Timedelta(days=i)
+        stamps = stamps[rng.random(len(stamps)) > 0.1] # drop some readings
+        kwh = rng.lognormal(mean=1.0 + i, sigma=0.5, size=len(stamps)).round(3)
+        frames.append(pd.DataFrame({"Building": name, "kwh": kwh}, index=stamps))
+    df = pd.concat(frames)
+    df.index.name = "Timestamp"
+    return df
+
+
+@pytest.fixture
+def readings():
+    return make_readings()
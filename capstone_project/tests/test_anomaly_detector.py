@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from main import HourlyAnomalyDetector, detect_anomalies
+
+
+def hourly_table(days=40, seed=1):
+    """Gap-free hourly load with a daily shape and small noise, plus 4 readings per hour."""
+    rng = np.random.default_rng(seed)
+    stamps = pd.date_range("2024-01-01", periods=days * 24, freq="h")
+    shape = 10 + 5 * np.sin(2 * np.pi * stamps.hour / 24)
+    frames = [
+        pd.DataFrame({
+            'Building': name,
+            'Timestamp': stamps,
+            'kwh': (shape + offset) * rng.normal(1.0, 0.01, len(stamps)),
+            'count': 4,
+        })
+        for name, offset in [('Alpha', 0.0), ('Beta', 20.0)]
+    ]
+    return pd.concat(frames, ignore_index=True)
+
+
+def at(df, building, timestamp):
+    return (df['Building'] == building) & (df['Timestamp'] == pd.Timestamp(timestamp))
+
+
+def test_steady_load_is_not_flagged():
+    assert detect_anomalies(hourly_table()).empty
+
+
+def test_spike_and_drop_are_flagged():
+    df = hourly_table()
+    df.loc[at(df, 'Alpha', "2024-02-01 10:00"), 'kwh'] *= 3
+    df.loc[at(df, 'Beta', "2024-02-06 18:00"), 'kwh'] = 0.0
+    found = detect_anomalies(df)
+    assert list(zip(found['Building'], found['Timestamp'].astype(str), found['kind'])) == [
+        ('Alpha', "2024-02-01 10:00:00", 'spike'),
+        ('Beta', "2024-02-06 18:00:00", 'drop'),
+    ]
+    # expected_kwh is the baseline for that hour of the day
+    typical = df[at(df, 'Alpha', "2024-01-31 10:00") | at(df, 'Alpha', "2024-01-30 10:00")]['kwh'].mean()
+    assert abs(found['expected_kwh'].iloc[0] / typical - 1) < 0.05
+
+
+def test_nothing_flagged_during_warmup():
+    df = hourly_table()
+    # Every weekday 10:00 slot is still warming up on the third day
+    df.loc[at(df, 'Alpha', "2024-01-03 10:00"), 'kwh'] *= 10
+    # Weekends have their own slots: only 8 weekend days precede 2024-02-03
+    df.loc[at(df, 'Beta', "2024-02-03 18:00"), 'kwh'] = 0.0
+    assert detect_anomalies(df).empty
+
+
+def test_missing_readings_are_not_drops():
+    df = hourly_table()
+    # An hour that lost a reading has less kWh but the same kWh per reading
+    hour = at(df, 'Alpha', "2024-02-01 10:00")
+    df.loc[hour, 'kwh'] *= 0.25
+    df.loc[hour, 'count'] = 1
+    # An hour without readings is skipped
+    empty = at(df, 'Beta', "2024-02-01 11:00")
+    df.loc[empty, ['kwh', 'count']] = 0
+    assert detect_anomalies(df).empty
+    # Without the count column the partial hour looks like a drop
+    assert detect_anomalies(df.drop(columns='count').loc[~empty])['kind'].tolist() == ['drop']
+
+
+def test_incremental_matches_batch():
+    df = hourly_table()
+    df.loc[at(df, 'Alpha', "2024-01-25 07:00"), 'kwh'] *= 3
+    df.loc[at(df, 'Beta', "2024-02-05 22:00"), 'kwh'] *= 0.1
+    df = df.sort_values('Timestamp', ignore_index=True)
+    detector = HourlyAnomalyDetector()
+    new = [detector.update(df.iloc[rows]) for rows in np.array_split(np.arange(len(df)), 17)]
+    assert sum(len(found) for found in new) == 2
+    pd.testing.assert_frame_equal(detector.anomalies, detect_anomalies(df))
+    # Hours that were already processed are ignored when sent again
+    assert detector.update(df.iloc[:100]).empty
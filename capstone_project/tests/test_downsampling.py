@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main import downsample_lttb, downsample_minmax
+
+
+def series(n=5000, seed=2):
+    rng = np.random.default_rng(seed)
+    x = pd.date_range("2024-01-01", periods=n, freq="15min").asi8
+    y = np.cumsum(rng.normal(size=n))
+    y[n // 4] += 50 # spike
+    y[n * 3 // 4] -= 50 # dip
+    return x, y
+
+
+@pytest.mark.parametrize("n_buckets", [7, 100, 1000])
+def test_minmax_keeps_bucket_extremes(n_buckets):
+    x, y = series()
+    x_out, y_out = downsample_minmax(x, y, n_buckets)
+    assert len(y_out) <= 3 * n_buckets + 1
+    assert np.all(np.diff(x_out) > 0)
+    assert x_out[0] == x[0] and x_out[-1] == x[-1]
+    # Every bucket's min and max (plain pandas groupby) are still there
+    edges = np.linspace(0, len(y), n_buckets + 1).astype(np.int64)
+    bucket = pd.cut(np.arange(len(y)), edges, right=False, labels=False)
+    frame = pd.Series(y).groupby(bucket).agg(['min', 'max'])
+    kept = pd.Series(y_out).groupby(pd.cut(np.searchsorted(x, x_out), edges, right=False, labels=False))
+    pd.testing.assert_frame_equal(kept.agg(['min', 'max']), frame)
+
+
+def test_minmax_short_input_unchanged():
+    x, y = series(30)
+    x_out, y_out = downsample_minmax(x, y, 10)
+    assert x_out is x and y_out is y
+
+
+def lttb_reference(x, y, n_out):
+    """Plain loop over the same bucket edges, one point at a time."""
+    x = x.astype(float)
+    edges = np.linspace(1, len(y) - 1, n_out - 1).astype(np.int64)
+    keep, a = [0], 0
+    for i in range(n_out - 2):
+        next_hi = edges[i + 2] if i + 2 < len(edges) else len(y)
+        avg_x, avg_y = x[edges[i + 1]:next_hi].mean(), y[edges[i + 1]:next_hi].mean()
+        best, best_area = None, -1.0
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        keep.append(best)
+        a = best
+    keep.append(len(y) - 1)
+    return np.array(keep)
+
+
+@pytest.mark.parametrize("n_out", [3, 50, 400])
+def test_lttb_matches_reference(n_out):
+    x, y = series()
+    x_out, y_out = downsample_lttb(x, y, n_out)
+    keep = lttb_reference(x, y, n_out)
+    assert len(y_out) == n_out
+    np.testing.assert_array_equal(x_out, x[keep])
+    np.testing.assert_array_equal(y_out, y[keep])
+
+
+def test_lttb_keeps_spike_and_dip():
+    x, y = series()
+    _, y_out = downsample_lttb(x, y, 200)
+    assert y_out.max() == y.max() and y_out.min() == y.min()
+
+
+def test_lttb_short_input_unchanged():
+    x, y = series(30)
+    x_out, y_out = downsample_lttb(x, y, 50)
+    assert x_out is x and y_out is y
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from main import LoadSketch
+from conftest import make_readings
+
+
+def exact_quantiles(df, by):
+    """Reading at rank floor(q * (n - 1)) of each group, which is what the sketch approximates."""
+    return df.groupby(by)['kwh'].quantile(list(LoadSketch.QUANTILES.values()), interpolation='lower').unstack()
+
+
+def sketch_of(df):
+    sketch = LoadSketch()
+    sketch.update(df['Building'].to_numpy(), df.index.to_numpy(), df['kwh'].to_numpy())
+    return sketch
+
+
+def test_quantiles_within_relative_accuracy(readings):
+    result = sketch_of(readings).quantiles()
+    expected = exact_quantiles(readings, 'Building')
+    expected.columns = list(LoadSketch.QUANTILES)
+    error = (result - expected).abs() / expected
+    assert (error <= LoadSketch.RELATIVE_ACCURACY + 1e-12).all().all()
+
+
+def test_hour_of_day_quantiles(readings):
+    result = sketch_of(readings).quantiles(('Building', 'Hour'))
+    expected = exact_quantiles(readings.assign(Hour=readings.index.hour), ['Building', 'Hour'])
+    expected.columns = list(LoadSketch.QUANTILES)
+    result = result.sort_index()
+    assert result.index.equals(expected.index)
+    error = (result - expected).abs() / expected
+    assert (error <= LoadSketch.RELATIVE_ACCURACY + 1e-12).all().all()
+
+
+def test_small_readings_report_zero():
+    df = pd.DataFrame(
+        {'Building': 'Alpha', 'kwh': [0.0, 0.0001, 0.0, 0.0]},
+        index=pd.date_range("2024-01-01", periods=4, freq="15min"),
+    )
+    assert (sketch_of(df).quantiles()['P50_kwh'] == 0).all()
+
+
+def test_merge_equals_single_sketch(readings):
+    parts = np.array_split(np.arange(len(readings)), 5)
+    merged = LoadSketch()
+    for rows in parts:
+        merged.merge(sketch_of(readings.iloc[rows]))
+    pd.testing.assert_frame_equal(merged.quantiles(), sketch_of(readings).quantiles())
+
+
+def test_many_updates_consolidate(readings):
+    sketch = LoadSketch()
+    for rows in np.array_split(np.arange(len(readings)), LoadSketch.CONSOLIDATE_EVERY * 2 + 3):
+        chunk = readings.iloc[rows]
+        sketch.update(chunk['Building'].to_numpy(), chunk.index.to_numpy(), chunk['kwh'].to_numpy())
+    pd.testing.assert_frame_equal(sketch.quantiles(), sketch_of(readings).quantiles())
+    restored = LoadSketch.from_table(sketch.table)
+    pd.testing.assert_frame_equal(restored.quantiles(), sketch.quantiles())
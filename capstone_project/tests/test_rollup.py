@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from main import (
+    BuildingManager, EnergyRollup, building_wise_summary,
+    calculate_daily_totals, calculate_weekly_aggregates,
+)
+
+
+def chunked_rollup(df, n_chunks):
+    rollup = EnergyRollup()
+    for rows in np.array_split(np.arange(len(df)), n_chunks):
+        rollup.update(df.iloc[rows])
+    return rollup
+
+
+def test_daily_and_weekly_match_resample(readings):
+    rollup = EnergyRollup.from_dataframe(readings)
+    pd.testing.assert_frame_equal(rollup.daily_totals(), calculate_daily_totals(readings))
+    pd.testing.assert_frame_equal(rollup.weekly_totals(), calculate_weekly_aggregates(readings))
+
+
+def test_hourly_totals_match_resample(readings):
+    result = EnergyRollup.from_dataframe(readings).hourly_totals()
+    grouped = readings.groupby('Building')['kwh']
+    expected = grouped.resample('h').agg(['sum', 'count']).reset_index()
+    np.testing.assert_allclose(result['kwh'], expected['sum'])
+    np.testing.assert_array_equal(result['count'], expected['count'])
+    assert (result['Timestamp'].to_numpy() == expected['Timestamp'].to_numpy()).all()
+
+
+def test_summary_matches_groupby(readings):
+    result, _ = EnergyRollup.from_dataframe(readings).building_summary()
+    expected, _ = building_wise_summary(readings)
+    columns = list(expected.columns)
+    pd.testing.assert_frame_equal(result[columns], expected, check_exact=False, rtol=1e-9)
+
+
+def test_std_survives_large_offset(readings):
+    # Readings far from zero: sum of squares minus squared sum would cancel
+    shifted = readings.assign(kwh=readings['kwh'] + 1e6)
+    stats = chunked_rollup(shifted, 7).building_stats()
+    expected = shifted.groupby('Building')['kwh'].std()
+    np.testing.assert_allclose(stats['std'], expected, rtol=1e-6)
+
+
+@pytest.mark.parametrize("n_chunks", [1, 5, 80])
+def test_chunked_updates_match_single_pass(readings, n_chunks):
+    single = EnergyRollup.from_dataframe(readings)
+    chunked = chunked_rollup(readings, n_chunks)
+    pd.testing.assert_frame_equal(chunked.base_table, single.base_table, check_exact=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(chunked.daily_totals(), single.daily_totals(), check_exact=False, rtol=1e-9)
+
+
+def test_merge_matches_single_pass(readings):
+    # Shards split by building and by time both merge to the same rollup
+    single = EnergyRollup.from_dataframe(readings)
+    for shards in (
+        [readings[readings['Building'] == name] for name in readings['Building'].unique()],
+        [readings.iloc[rows] for rows in np.array_split(np.arange(len(readings)), 3)],
+    ):
+        merged = EnergyRollup()
+        for shard in shards:
+            merged.merge(EnergyRollup.from_dataframe(shard))
+        pd.testing.assert_frame_equal(merged.building_stats(), single.building_stats(), check_exact=False, rtol=1e-9)
+        pd.testing.assert_frame_equal(merged.sketch.quantiles(), single.sketch.quantiles())
+
+
+def test_base_table_round_trip(readings):
+    rollup = EnergyRollup.from_dataframe(readings)
+    restored = EnergyRollup.from_base_table(rollup.base_table, rollup.sketch.table)
+    pd.testing.assert_frame_equal(restored.building_summary()[0], rollup.building_summary()[0])
+
+
+def test_hour_of_day_profile_matches_groupby(readings):
+    result = EnergyRollup.from_dataframe(readings).hour_of_day_profile()
+    hourly = readings.groupby('Building')['kwh'].resample('h').sum().reset_index()
+    expected = hourly.groupby(['Building', hourly['Timestamp'].dt.hour.rename('Hour')])['kwh'].mean().reset_index()
+    np.testing.assert_allclose(result['kwh'], expected['kwh'])
+    assert (result[['Building', 'Hour']].to_numpy() == expected[['Building', 'Hour']].to_numpy()).all()
+
+
+def test_peak_hour_matches_groupby(readings):
+    campus = readings['kwh'].resample('h').sum()
+    expected = int(campus.groupby(campus.index.hour).mean().idxmax())
+    assert EnergyRollup.from_dataframe(readings).peak_hour() == expected
+
+
+def test_manager_live_views_match_rollup(readings):
+    # Readings appended in batches, as the live mode receives them
+    manager = BuildingManager()
+    for rows in np.array_split(np.arange(len(readings)), 6):
+        manager.append_dataframe(readings.iloc[rows])
+        manager.daily_totals()
+    rollup = EnergyRollup.from_dataframe(readings)
+    pd.testing.assert_frame_equal(manager.daily_totals(), rollup.daily_totals(), check_exact=False, rtol=1e-9)
+    pd.testing.assert_frame_equal(manager.weekly_totals(), rollup.weekly_totals(), check_exact=False, rtol=1e-9)
+    expected, _ = building_wise_summary(readings)
+    pd.testing.assert_frame_equal(manager.summary_frame(), expected, check_exact=False, rtol=1e-9)
+    assert manager.peak_hour() == rollup.peak_hour()
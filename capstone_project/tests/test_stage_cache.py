@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+import main
+from main import StageCache
+
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    out = tmp_path / "output"
+    out.mkdir()
+    monkeypatch.setattr(main, "OUTPUT_DIR", out)
+    return out
+
+
+def write(path, size):
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_round_trip_restores_value_and_files(tmp_path, output_dir):
+    cache = StageCache(tmp_path / "cache", max_bytes=10**6)
+    value = pd.DataFrame({'Building': ['Alpha'], 'kwh': [1.5]})
+    report = write(output_dir / "summary.txt", 100)
+    key = StageCache.key("summary", {'data': 1})
+    cache.store(key, "summary", value, files=[report])
+    report.unlink()
+    hit, restored = cache.lookup(key)
+    assert hit
+    pd.testing.assert_frame_equal(restored, value)
+    assert report.read_bytes() == b"x" * 100
+    # The manifest survives a restart
+    hit, _ = StageCache(tmp_path / "cache", max_bytes=10**6).lookup(key)
+    assert hit
+
+
+def test_changed_inputs_are_a_miss(tmp_path, output_dir):
+    cache = StageCache(tmp_path / "cache", max_bytes=10**6)
+    cache.store(StageCache.key("daily", {'data': 1}), "daily", 1)
+    assert cache.lookup(StageCache.key("daily", {'data': 2})) == (False, None)
+    assert cache.lookup(StageCache.key("weekly", {'data': 1})) == (False, None)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, output_dir):
+    cache = StageCache(tmp_path / "cache", max_bytes=2500)
+    keys = [StageCache.key("stage", i) for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.store(key, "stage", files=[write(output_dir / f"out{i}.bin", 1000)])
+    assert cache.lookup(keys[0])[0] # now keys[1] is the least recently used
+    cache.store(keys[2], "stage", files=[write(output_dir / "out2.bin", 1000)])
+    assert set(cache.entries) == {keys[0], keys[2]}
+    assert not (tmp_path / "cache" / keys[1]).exists()
+    assert sum(entry['size'] for entry in cache.entries.values()) <= 2500
+    # Lowering the limit evicts on load
+    assert list(StageCache(tmp_path / "cache", max_bytes=1500).entries) == [keys[2]]
+
+
+def test_changed_in_place_file_is_a_miss(tmp_path, output_dir):
+    cache = StageCache(tmp_path / "cache", max_bytes=10**6)
+    export = write(output_dir / "cleaned_energy_data.csv", 5000)
+    key = StageCache.key("export", 1)
+    cache.store(key, "export", in_place=[export])
+    assert cache.entries[key]['size'] < 5000 # recorded, not copied
+    assert cache.lookup(key)[0]
+    write(export, 4000)
+    os.utime(export, ns=(1, 1))
+    assert cache.lookup(key) == (False, None)
+    assert key not in cache.entries
+
+
+def test_disabled_cache_stores_nothing(tmp_path, output_dir):
+    cache = StageCache(tmp_path / "cache", max_bytes=10**6, enabled=False)
+    key = StageCache.key("daily", 1)
+    cache.store(key, "daily", 1)
+    assert cache.lookup(key) == (False, None)
+    assert not (tmp_path / "cache").exists()